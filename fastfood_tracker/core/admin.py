@@ -1,5 +1,10 @@
 # In core/admin.py
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 # --- UPDATED IMPORTS ---
 # We've removed MacroTracker and added the new models
@@ -9,32 +14,174 @@ from .models import (
     MenuItem, 
     Profile, 
     FavoriteMeal,
+    FavoriteMealItem,
     LoggedMeal,     # <-- New
-    LoggedMealItem  # <-- New
+    LoggedMealItem, # <-- New
+    ArchivedMealMonth,
+    Job
 )
+from .jobs import enqueue
+
+class EstimatedCountPaginator(Paginator):
+    """
+    On Postgres, an unfiltered changelist uses the planner's row estimate
+    for huge tables instead of running COUNT(*) over millions of rows.
+    Filtered lists (and other databases) still get an exact count.
+    """
+    ESTIMATE_ABOVE = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [queryset.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= self.ESTIMATE_ABOVE:
+                    return row[0]
+        return super().count
+
+class MenuItemChoiceMixin:
+    """
+    MenuItem.__str__ shows the restaurant name, so load it in the same query.
+    """
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'menu_item':
+            kwargs['queryset'] = MenuItem.objects.select_related('restaurant')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 # --- This makes the admin panel much more useful ---
-class LoggedMealItemInline(admin.TabularInline):
+class LoggedMealItemInline(MenuItemChoiceMixin, admin.TabularInline):
     """
     Shows the items inside the meal view.
     """
     model = LoggedMealItem
     extra = 0 # Don't show extra empty forms
+    # A search box instead of a <select> holding the whole catalog
+    autocomplete_fields = ('menu_item',)
 
 class LoggedMealAdmin(admin.ModelAdmin):
     """
-    Custom admin view for LoggedMeal.
+    Custom admin view for LoggedMeal. Built to stay fast with millions of
+    rows: no per-user sidebar filter, users picked by id, and no exact
+    COUNT(*) on the unfiltered list.
     """
-    list_display = ('user', 'name', 'created_at')
+    list_display = ('id', 'user', 'name', 'created_at')
+    list_select_related = ('user',)
     inlines = [LoggedMealItemInline] # Nests the items inside the meal
-    list_filter = ('user', 'created_at')
+    list_filter = ('created_at',)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('user',)
+    # Exact match so it can use the unique index on username
+    search_fields = ('=user__username',)
+    search_help_text = 'Exact username'
+    ordering = ('-created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class MenuItemAdmin(admin.ModelAdmin):
+    list_display = ('name', 'restaurant', 'category', 'calories', 'protein')
+    list_select_related = ('restaurant',)
+    list_filter = ('restaurant',)
+    # Also used by the autocomplete widgets on the meal and favorite inlines
+    search_fields = ('name', 'restaurant__name')
+    ordering = ('name',)
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        return queryset.select_related('restaurant'), may_have_duplicates
+
+class FavoriteMealItemInline(MenuItemChoiceMixin, admin.TabularInline):
+    model = FavoriteMealItem
+    extra = 0
+    autocomplete_fields = ('menu_item',)
+
+class FavoriteMealAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'total_calories', 'total_protein')
+    list_select_related = ('user',)
+    inlines = [FavoriteMealItemInline]
+    raw_id_fields = ('user',)
+    readonly_fields = ('total_calories', 'total_protein', 'total_fat', 'total_carbs')
+    search_fields = ('=user__username',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Keep the cached totals in line with the edited items
+        form.instance.refresh_totals()
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'calorie_goal', 'timezone')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('=user__username',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class ArchivedMealMonthAdmin(admin.ModelAdmin):
+    list_display = ('user', 'month', 'meal_count', 'item_count', 'total_calories')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('=user__username',)
+    date_hierarchy = 'month'
+    readonly_fields = ('meal_count', 'item_count', 'total_calories', 'total_protein', 'total_fat', 'total_carbs', 'archived_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class RestaurantAdmin(admin.ModelAdmin):
+    """
+    Catalog maintenance is queued as background jobs (see core/jobs.py)
+    so it never runs inside a web request. The actions apply to the whole
+    catalog, so any selection will do.
+    """
+    actions = ['reload_menu_data', 'rebuild_similar_items', 'rebuild_best_picks']
+    search_fields = ('name',)
+
+    @admin.action(description="Reload all menu data from CSV (background job; deletes every user's logged meal items and favorite items)")
+    def reload_menu_data(self, request, queryset):
+        job = enqueue('load_menu_data', unique=True)
+        self.message_user(request, f'Queued job #{job.pk}: {job.task}.')
+
+    @admin.action(description='Rebuild similar items (background job)')
+    def rebuild_similar_items(self, request, queryset):
+        job = enqueue('rebuild_similar_items', unique=True)
+        self.message_user(request, f'Queued job #{job.pk}: {job.task}.')
+
+    @admin.action(description='Rebuild best-pick rankings (background job)')
+    def rebuild_best_picks(self, request, queryset):
+        job = enqueue('rebuild_best_picks', unique=True)
+        self.message_user(request, f'Queued job #{job.pk}: {job.task}.')
+
+class JobAdmin(admin.ModelAdmin):
+    """
+    Shows the background job queue and lets you retry failed jobs.
+    """
+    list_display = ('id', 'task', 'status', 'progress', 'progress_message', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('attempts', 'progress', 'progress_message', 'last_error', 'created_at', 'started_at', 'finished_at', 'locked_by')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected jobs')
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(), locked_by='', last_error='',
+        )
+        self.message_user(request, f'Requeued {count} job(s).')
 
 # --- Register your models here ---
 admin.site.register(User)
-admin.site.register(Restaurant)
-admin.site.register(MenuItem)
-admin.site.register(Profile)
-admin.site.register(FavoriteMeal)
+admin.site.register(Restaurant, RestaurantAdmin)
+admin.site.register(MenuItem, MenuItemAdmin)
+admin.site.register(Profile, ProfileAdmin)
+admin.site.register(FavoriteMeal, FavoriteMealAdmin)
 
 # --- NEW REGISTRATIONS ---
-admin.site.register(LoggedMeal, LoggedMealAdmin) # Use the custom admin class
\ No newline at end of file
+admin.site.register(LoggedMeal, LoggedMealAdmin) # Use the custom admin class
+admin.site.register(ArchivedMealMonth, ArchivedMealMonthAdmin)
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,193 @@
+# In core/archive.py
+"""
+Retention for the meal log. Meals older than the horizon are moved out of
+LoggedMeal/LoggedMealItem into one ArchivedMealMonth row per user and month,
+which keeps the hot tables (and their indexes) small.
+
+History and export read both: hot meals from the usual tables, older ones
+unpacked from the archive by the helpers below.
+
+Native Postgres range partitioning of LoggedMeal was considered, but a
+partitioned table's primary key has to include created_at, which the
+LoggedMealItem foreign key can't reference. Archiving gets the same
+"hot data stays small" effect without changing those keys.
+"""
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from .models import ArchivedMealMonth, LoggedMeal, LoggedMealItem
+from .serializers import MenuItemSerializer
+
+# Totals kept on each archive row: model field -> MenuItem field
+TOTAL_FIELDS = {
+    'total_calories': 'calories',
+    'total_protein': 'protein',
+    'total_fat': 'fat',
+    'total_carbs': 'carbohydrates',
+}
+
+_datetime_field = serializers.DateTimeField()
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _utc_midnight(day):
+    return datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
+
+
+def _apply_totals(archive):
+    """
+    Recomputes the counts and totals of an archive row from its data.
+    """
+    menu_items = archive.data['menu_items']
+    meals = archive.data['meals']
+    archive.meal_count = len(meals)
+    archive.item_count = sum(quantity for meal in meals for _, quantity in meal['items'])
+    for total_field, nutrient in TOTAL_FIELDS.items():
+        setattr(archive, total_field, sum(
+            (menu_items[str(menu_item_id)].get(nutrient) or 0) * quantity
+            for meal in meals for menu_item_id, quantity in meal['items']
+        ))
+
+
+def archive_user_month(user_id, month, cutoff):
+    """
+    Moves one user's meals from `month` that are older than `cutoff` into
+    that month's archive row, merging with anything already archived.
+    Returns how many meals were moved.
+    """
+    start = _utc_midnight(month)
+    end = min(_utc_midnight(next_month(month)), cutoff)
+
+    with transaction.atomic():
+        meals = list(
+            LoggedMeal.objects
+            .filter(user_id=user_id, created_at__gte=start, created_at__lt=end)
+            .order_by('created_at', 'id')
+        )
+        if not meals:
+            return 0
+
+        items_by_meal = {}
+        menu_items = {}
+        logged_items = (
+            LoggedMealItem.objects
+            .filter(logged_meal__in=meals)
+            .select_related('menu_item__restaurant')
+            .order_by('id')
+        )
+        for logged_item in logged_items:
+            menu_item = logged_item.menu_item
+            if str(menu_item.id) not in menu_items:
+                snapshot = dict(MenuItemSerializer(menu_item).data)
+                snapshot['restaurant'] = menu_item.restaurant.name
+                menu_items[str(menu_item.id)] = snapshot
+            items_by_meal.setdefault(logged_item.logged_meal_id, []).append([menu_item.id, logged_item.quantity])
+
+        archive, _ = ArchivedMealMonth.objects.select_for_update().get_or_create(
+            user_id=user_id, month=month, defaults={'data': {'menu_items': {}, 'meals': []}},
+        )
+        archive.data['menu_items'].update(menu_items)
+        archive.data['meals'].extend(
+            {
+                'id': meal.id,
+                'name': meal.name,
+                'created_at': _datetime_field.to_representation(meal.created_at),
+                'items': items_by_meal.get(meal.id, []),
+            }
+            for meal in meals
+        )
+        archive.data['meals'].sort(key=lambda meal: (parse_datetime(meal['created_at']), meal['id']))
+        _apply_totals(archive)
+        archive.save()
+
+        LoggedMeal.objects.filter(id__in=[meal.id for meal in meals]).delete()
+    return len(meals)
+
+
+def archive_meals(cutoff, log=None, progress=None):
+    """
+    Archives every meal created before `cutoff`, one user-month at a time
+    (each in its own transaction). Returns the number of meals archived.
+    """
+    groups = list(
+        LoggedMeal.objects
+        .filter(created_at__lt=cutoff)
+        .annotate(month=TruncMonth('created_at', tzinfo=dt_timezone.utc))
+        .values_list('user_id', 'month')
+        .distinct()
+        .order_by('month', 'user_id')
+    )
+    moved = 0
+    for index, (user_id, month) in enumerate(groups, start=1):
+        count = archive_user_month(user_id, month_start(month), cutoff)
+        moved += count
+        if log:
+            log(f'User {user_id}, {month:%Y-%m}: archived {count} meals')
+        if progress:
+            progress(index, len(groups))
+    return moved
+
+
+def _archives(user, start=None, end=None, newest_first=True):
+    archives = ArchivedMealMonth.objects.filter(user=user)
+    if start:
+        archives = archives.filter(month__gte=month_start(start.astimezone(dt_timezone.utc)))
+    if end:
+        archives = archives.filter(month__lte=end.astimezone(dt_timezone.utc).date())
+    return archives.order_by('-month' if newest_first else 'month')
+
+
+def _in_range(meal, start, end):
+    created_at = parse_datetime(meal['created_at'])
+    return (start is None or created_at >= start) and (end is None or created_at < end)
+
+
+def iter_archived_meals(user, start=None, end=None):
+    """
+    Yields archived meals newest first, in the same shape as
+    LoggedMealSerializer, optionally limited to a [start, end) range.
+    """
+    for archive in _archives(user, start, end).iterator():
+        menu_items = archive.data['menu_items']
+        for meal in reversed(archive.data['meals']):
+            if not _in_range(meal, start, end):
+                continue
+            yield {
+                'id': meal['id'],
+                'name': meal['name'],
+                'created_at': meal['created_at'],
+                'logged_items': [
+                    {
+                        'menu_item': {
+                            key: value for key, value in menu_items[str(menu_item_id)].items()
+                            if key != 'restaurant'
+                        },
+                        'quantity': quantity,
+                    }
+                    for menu_item_id, quantity in meal['items']
+                ],
+            }
+
+
+def iter_archived_items(user):
+    """
+    Yields (meal_id, meal_name, created_at, menu_item_snapshot, quantity)
+    for every archived item, oldest first. Used by the history export.
+    """
+    for archive in _archives(user, newest_first=False).iterator():
+        menu_items = archive.data['menu_items']
+        for meal in archive.data['meals']:
+            created_at = parse_datetime(meal['created_at'])
+            for menu_item_id, quantity in meal['items']:
+                yield meal['id'], meal['name'], created_at, menu_items[str(menu_item_id)], quantity
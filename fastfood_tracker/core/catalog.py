@@ -0,0 +1,105 @@
+# In core/catalog.py
+"""
+Loading the restaurant catalog from the CSV. Shared by the load_menu_data
+command and the background job of the same name.
+"""
+import csv
+import os
+
+from django.db import transaction
+
+from .models import FavoriteMeal, Restaurant, MenuItem, NUTRIENT_FIELDS
+
+DEFAULT_CSV_PATH = os.path.join(os.path.dirname(__file__), 'Restaurant_data.csv')
+
+
+def read_menu_csv(csv_file_path=DEFAULT_CSV_PATH):
+    """
+    Parses the whole CSV without touching the database. Returns
+    (rows, skipped): rows is a list of (restaurant_name, MenuItem field dict),
+    skipped a list of messages for rows whose numbers couldn't be read (e.g.
+    columns shifted by an unquoted comma in the item name).
+    """
+    with open(csv_file_path, mode='r', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+
+    parsed = []
+    skipped = []
+    # Line 1 is the header
+    for line, row in enumerate(rows, start=2):
+        restaurant_name = row.get('Restaurant') or row.get('rest_name')
+        item_name = row.get('Item') or row.get('item_name')
+        if not (restaurant_name and item_name):
+            continue
+
+        fields = {
+            'name': item_name,
+            'category': row.get('category'),
+            'serving_size': row.get('serving_size'),
+        }
+        bad_column = None
+        for column in NUTRIENT_FIELDS:
+            # R: The model expects a float, not an int.
+            try:
+                fields[column] = float(row.get(column, 0))
+            except (TypeError, ValueError):
+                bad_column = column
+                break
+        if bad_column:
+            skipped.append(
+                f"line {line} ({item_name.strip()!r}): {bad_column} is not a number: {row.get(bad_column)!r}"
+            )
+            continue
+        parsed.append((restaurant_name, fields))
+    return parsed, skipped
+
+
+def load_menu_csv(csv_file_path=DEFAULT_CSV_PATH, log=None, progress=None):
+    """
+    Replaces all restaurants and menu items with the rows of the CSV file.
+    `log` is called with status messages and `progress` with (done, total).
+    Returns the number of menu items loaded. Errors are raised to the caller.
+
+    Rows that can't be parsed are skipped and reported through `log`.
+
+    Deleting the restaurants cascades to every LoggedMealItem, FavoriteMealItem,
+    SimilarItem and BestPick row, so the whole file is read first and the
+    delete and reload run in one transaction: a failure leaves the old catalog
+    (and everyone's history) untouched.
+    """
+    log = log or (lambda message: None)
+
+    rows, skipped = read_menu_csv(csv_file_path)
+    for message in skipped:
+        log(f'Skipped {message}')
+    if not rows:
+        raise ValueError(f'No usable rows in {csv_file_path}; keeping the current catalog.')
+    total = len(rows)
+
+    # Job progress written inside the transaction below would stay invisible
+    # until it commits, so only report before and after it. Bulk inserts keep
+    # the transaction itself short.
+    if progress:
+        progress(0, total)
+
+    with transaction.atomic():
+        # R: This is the fix. We only need to delete the restaurants.
+        # Deleting the restaurants will automatically cascade and delete all
+        # of their associated menu items, which avoids the error.
+        Restaurant.objects.all().delete()
+        log('Cleared existing Restaurant and MenuItem data.')
+
+        names = list(dict.fromkeys(restaurant_name for restaurant_name, _ in rows))
+        Restaurant.objects.bulk_create([Restaurant(name=name) for name in names])
+        restaurant_ids = dict(Restaurant.objects.values_list('name', 'id'))
+        MenuItem.objects.bulk_create(
+            [MenuItem(restaurant_id=restaurant_ids[restaurant_name], **fields) for restaurant_name, fields in rows],
+            batch_size=500,
+        )
+
+        # The reload removed every favorite's items, so their cached totals are now 0
+        FavoriteMeal.refresh_totals_for(FavoriteMeal.objects.all())
+
+    if progress:
+        progress(total, total)
+    return total
@@ -0,0 +1,76 @@
+# In core/dates.py
+"""
+Helpers for turning a day or a span of days in the user's own timezone into
+half-open [start, end) datetime ranges.
+
+Filtering with `created_at__gte=start, created_at__lt=end` lets the database
+use an index range scan on `created_at`, unlike `created_at__date=...` which
+wraps the column in a cast. Tracker, history and any other range queries
+should all build their filters through here.
+"""
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+
+DEFAULT_TIMEZONE = 'UTC'
+
+
+def user_timezone(user):
+    """
+    Returns the ZoneInfo for a user's profile, falling back to UTC when the
+    user has no profile or an unknown timezone name.
+    """
+    name = DEFAULT_TIMEZONE
+    profile = getattr(user, 'profile', None) if user is not None else None
+    if profile is not None and profile.timezone:
+        name = profile.timezone
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def local_today(user):
+    """
+    Returns today's date as seen by the user.
+    """
+    return timezone.now().astimezone(user_timezone(user)).date()
+
+
+def local_midnight(day, tz):
+    """
+    Returns the aware datetime for the start of `day` in `tz`.
+    """
+    return datetime.combine(day, time.min, tzinfo=tz)
+
+
+def date_range(user, start_day, end_day):
+    """
+    Returns (start, end) aware datetimes covering the local dates
+    start_day..end_day inclusive, as a half-open range.
+    """
+    tz = user_timezone(user)
+    return local_midnight(start_day, tz), local_midnight(end_day + timedelta(days=1), tz)
+
+
+def day_range(user, day=None):
+    """
+    Returns the [start, end) range for a single local day (default: today).
+    """
+    day = day or local_today(user)
+    return date_range(user, day, day)
+
+
+def created_between(start, end, prefix=''):
+    """
+    Builds sargable filter kwargs for a `created_at` range. Pass a prefix such
+    as 'logged_meal__' when filtering through a relation; a bound of None
+    leaves that side open.
+    """
+    bounds = {}
+    if start is not None:
+        bounds[f'{prefix}created_at__gte'] = start
+    if end is not None:
+        bounds[f'{prefix}created_at__lt'] = end
+    return bounds
@@ -0,0 +1,93 @@
+# In core/db_routers.py
+"""
+Sends catalog and history reads to a read replica, and everything else
+to the primary ('default') database.
+
+Routing to the replica only happens inside web requests, and a request is
+pinned to the primary as soon as it writes anything (or if the same client
+wrote recently, see core.middleware.ReplicaPinMiddleware), so users always
+read their own writes. Management commands and the job worker always use
+the primary.
+
+The replica is only used when settings.DATABASES has an entry named
+settings.DATABASE_REPLICA_ALIAS. Without it this router does nothing.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+# Models whose reads are safe to serve from a slightly stale replica
+REPLICA_READ_MODELS = {
+    'core.restaurant',
+    'core.menuitem',
+    'core.similaritem',
+    'core.bestpick',
+    'core.loggedmeal',
+    'core.loggedmealitem',
+    'core.archivedmealmonth',
+}
+
+# None outside a request, otherwise whether this request must use the primary
+_use_primary = ContextVar('use_primary', default=None)
+
+
+def start_request(use_primary=False):
+    """
+    Called by the middleware at the start of a request. Returns a token for
+    end_request().
+    """
+    return _use_primary.set(use_primary)
+
+
+def end_request(token):
+    _use_primary.reset(token)
+
+
+def request_uses_primary():
+    """
+    Whether the current request is pinned to the primary (None outside a request).
+    """
+    return _use_primary.get()
+
+
+def pin_to_primary():
+    """
+    Sends every remaining query of the current request to the primary.
+    """
+    if _use_primary.get() is not None:
+        _use_primary.set(True)
+
+
+def replica_alias():
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = replica_alias()
+        if replica is None or _use_primary.get() is not False:
+            return None
+        if model._meta.label_lower not in REPLICA_READ_MODELS:
+            return None
+        # Reads inside a transaction on the primary must see that transaction
+        if connections['default'].in_atomic_block:
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        allowed = {'default', replica_alias()}
+        if obj1._state.db in allowed and obj2._state.db in allowed:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Production replicas get their schema through replication, but local
+        # SQLite replicas need `migrate --database=replica`, so allow both.
+        return None
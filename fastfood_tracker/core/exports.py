@@ -0,0 +1,100 @@
+# In core/exports.py
+"""
+Streams a user's logged meal items as CSV or NDJSON lines.
+
+Rows come from the archive (one month row at a time) and then from a
+server-side iterator over LoggedMealItem, with the menu items for each
+chunk fetched in one query, so memory stays flat no matter how long the
+history is.
+"""
+import csv
+import json
+from itertools import islice
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .archive import iter_archived_items
+from .dates import user_timezone
+from .models import LoggedMealItem, MenuItem, NUTRIENT_FIELDS
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    'meal_id', 'meal_name', 'logged_at', 'restaurant',
+    'item_id', 'item_name', 'quantity', *NUTRIENT_FIELDS,
+]
+
+
+def iter_history_rows(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields one dict per logged item, oldest meal first. Timestamps are
+    in the user's own timezone. Nutrients are per single item; multiply
+    by quantity for the amount eaten.
+    """
+    tz = user_timezone(user)
+
+    # Archived meals are older than anything still in LoggedMeal, so they come first
+    for meal_id, meal_name, created_at, item, quantity in iter_archived_items(user):
+        yield _make_row(tz, meal_id, meal_name, created_at, menu_item_id=item.get('id'),
+                        quantity=quantity, item=item, restaurant=item.get('restaurant', ''))
+
+    logged_items = (
+        LoggedMealItem.objects
+        .filter(logged_meal__user=user)
+        .order_by('logged_meal__created_at', 'logged_meal_id', 'id')
+        .values_list('logged_meal_id', 'logged_meal__name', 'logged_meal__created_at', 'menu_item_id', 'quantity')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    while True:
+        chunk = list(islice(logged_items, chunk_size))
+        if not chunk:
+            break
+
+        menu_items = {
+            item['id']: item
+            for item in MenuItem.objects
+            .filter(id__in={row[3] for row in chunk})
+            .values('id', 'name', 'restaurant__name', *NUTRIENT_FIELDS)
+        }
+
+        for meal_id, meal_name, created_at, menu_item_id, quantity in chunk:
+            item = menu_items.get(menu_item_id, {})
+            yield _make_row(tz, meal_id, meal_name, created_at, menu_item_id=menu_item_id,
+                            quantity=quantity, item=item, restaurant=item.get('restaurant__name', ''))
+
+
+def _make_row(tz, meal_id, meal_name, created_at, menu_item_id, quantity, item, restaurant):
+    row = {
+        'meal_id': meal_id,
+        'meal_name': meal_name or '',
+        'logged_at': created_at.astimezone(tz).isoformat(),
+        'restaurant': restaurant,
+        'item_id': menu_item_id,
+        'item_name': item.get('name', ''),
+        'quantity': quantity,
+    }
+    for field in NUTRIENT_FIELDS:
+        row[field] = item.get(field)
+    return row
+
+
+class _Echo:
+    """
+    A file-like object for csv.writer that hands back each line
+    instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[column] for column in EXPORT_COLUMNS])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=JSONEncoder) + '\n'
@@ -0,0 +1,164 @@
+# In core/jobs.py
+"""
+A small database-backed job queue, so heavy catalog work runs in a
+separate `python manage.py run_jobs` process instead of a web worker.
+
+Tasks are plain functions registered with @task (see core/tasks.py).
+They receive the Job as their first argument, so they can call
+job.set_progress(), plus the job's payload as keyword arguments.
+"""
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+# Task name -> its enqueue defaults ('max_attempts' and 'group')
+TASK_OPTIONS = {}
+
+# Seconds before the first retry; doubled on each further attempt
+RETRY_BACKOFF_SECONDS = 30
+# A running job with no heartbeat for this long is assumed to belong to a dead
+# worker. run_jobs beats every --poll seconds, so keep this well above that.
+STALE_AFTER = timedelta(minutes=5)
+
+
+def task(name, max_attempts=3, group=''):
+    """
+    Registers a function as a task that can be queued by name.
+    `max_attempts` is the default for jobs of this task; use 1 for tasks
+    that must not be retried automatically. Tasks with the same `group`
+    are never run at the same time, even by different workers.
+    """
+    def register(func):
+        TASKS[name] = func
+        TASK_OPTIONS[name] = {'max_attempts': max_attempts, 'group': group}
+        return func
+    return register
+
+
+def enqueue(task_name, unique=False, max_attempts=None, **payload):
+    """
+    Queues a task to run in the background and returns the Job.
+    With unique=True, an already queued or running job for the same task is
+    returned instead of adding a second one.
+    """
+    if task_name not in TASKS:
+        raise ValueError(f"Unknown task '{task_name}'.")
+    if max_attempts is None:
+        max_attempts = TASK_OPTIONS[task_name]['max_attempts']
+    if unique:
+        existing = (
+            Job.objects.filter(task=task_name, status__in=[Job.QUEUED, Job.RUNNING])
+            .order_by('id').first()
+        )
+        if existing:
+            return existing
+    return Job.objects.create(
+        task=task_name, payload=payload, max_attempts=max_attempts, group=TASK_OPTIONS[task_name]['group'],
+    )
+
+
+def claim_next(worker_name):
+    """
+    Marks the oldest due job as running for this worker and returns it,
+    or None if nothing is due. The conditional UPDATE means two workers can
+    never both claim the same job, on any database backend, and the
+    one_running_job_per_group constraint rejects a claim while another job
+    of the same group is running.
+    """
+    now = timezone.now()
+    busy_groups = Job.objects.filter(status=Job.RUNNING).exclude(group='').values('group')
+    candidates = (
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .exclude(group__in=busy_groups)
+        .order_by('run_after', 'id')
+    )
+    for job_id in candidates.values_list('id', flat=True)[:10]:
+        try:
+            with transaction.atomic():
+                claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+                    status=Job.RUNNING,
+                    started_at=now,
+                    heartbeat_at=now,
+                    locked_by=worker_name,
+                    progress=0,
+                    progress_message='',
+                )
+        except IntegrityError:
+            # Another worker just started a job of the same group
+            continue
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def heartbeat(worker_name, job_ids):
+    """
+    Records that this worker is still running these jobs.
+    """
+    return Job.objects.filter(pk__in=job_ids, status=Job.RUNNING, locked_by=worker_name).update(
+        heartbeat_at=timezone.now(),
+    )
+
+
+def requeue_stale_jobs():
+    """
+    Deals with running jobs whose worker has stopped sending heartbeats for
+    STALE_AFTER: jobs with attempts left go back in the queue, the others
+    are marked failed (so e.g. a max_attempts=1 task is never re-run on its
+    own). Returns (requeued, failed) counts.
+    """
+    now = timezone.now()
+    cutoff = now - STALE_AFTER
+    stale = Job.objects.filter(status=Job.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', finished_at=now,
+        last_error='The worker running this job stopped responding.',
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, locked_by='', run_after=now,
+    )
+    return requeued, failed
+
+
+def run_job(job_id):
+    """
+    Runs one claimed job and records the result. Failed jobs go back in the
+    queue with a backoff until they run out of attempts.
+    Returns the job's final status.
+    """
+    close_old_connections()
+    job = Job.objects.get(pk=job_id)
+    job.attempts += 1
+    Job.objects.filter(pk=job.pk).update(attempts=job.attempts)
+
+    try:
+        func = TASKS[job.task]
+        func(job, **job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+            job.locked_by = ''
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'last_error', 'run_after', 'locked_by', 'finished_at'])
+    else:
+        job.status = Job.SUCCEEDED
+        job.progress = 100
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'progress', 'finished_at'])
+    finally:
+        # Each pool thread has its own connection; don't leave it open between jobs
+        connection.close()
+
+    return job.status
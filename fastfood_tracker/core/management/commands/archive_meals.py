@@ -0,0 +1,44 @@
+# In core/management/commands/archive_meals.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.archive import archive_meals
+from core.jobs import enqueue
+from core.models import LoggedMeal
+
+class Command(BaseCommand):
+    help = 'Moves old meals into the compact per-user, per-month archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=None,
+            help='Archive meals older than this (default: settings.MEAL_ARCHIVE_AFTER_DAYS).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many meals would be archived.')
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Queue the archive as a background job for run_jobs instead of running it here.',
+        )
+
+    def handle(self, *args, **options):
+        days = options['older_than_days']
+        if days is None:
+            days = settings.MEAL_ARCHIVE_AFTER_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+
+        if options['enqueue']:
+            job = enqueue('archive_meals', unique=True, older_than_days=days)
+            self.stdout.write(self.style.SUCCESS(f'Queued job #{job.pk}. Run "python manage.py run_jobs" to process it.'))
+            return
+
+        if options['dry_run']:
+            count = LoggedMeal.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f'{count} meals are older than {cutoff:%Y-%m-%d} and would be archived.')
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'--- Archiving meals older than {cutoff:%Y-%m-%d %H:%M} ---'))
+        moved = archive_meals(cutoff, log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'--- Archived {moved} meals ---'))
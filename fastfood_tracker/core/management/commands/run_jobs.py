@@ -0,0 +1,96 @@
+# In core/management/commands/run_jobs.py
+
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.jobs import claim_next, heartbeat, requeue_stale_jobs, run_job
+from core.models import Job
+
+
+def _init_process():
+    # Child processes started with "spawn" need Django set up again
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (catalog reloads, index rebuilds, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='How many jobs to run at once.')
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help='Run jobs in threads (default) or in separate processes.',
+        )
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait between checks for new jobs.')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+
+        if options['pool'] == 'process':
+            # Connections must not be shared with forked children
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_process)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+        self.stdout.write(self.style.SUCCESS(f'--- {worker_name} running jobs with {workers} {options["pool"]} worker(s) ---'))
+
+        in_flight = {}
+        try:
+            while True:
+                # Keep our own jobs alive, then pick up after workers that died
+                if in_flight:
+                    heartbeat(worker_name, [job.pk for job in in_flight.values()])
+                self._requeue_stale()
+
+                while len(in_flight) < workers:
+                    job = claim_next(worker_name)
+                    if job is None:
+                        break
+                    self.stdout.write(f'Started {job} (attempt {job.attempts + 1}/{job.max_attempts})')
+                    in_flight[executor.submit(run_job, job.pk)] = job
+
+                if not in_flight:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                done, _ = wait(in_flight, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    self._report(job, future)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping; waiting for running jobs to finish...')
+        finally:
+            executor.shutdown(wait=True)
+
+    def _requeue_stale(self):
+        requeued, failed = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s).'))
+        if failed:
+            self.stdout.write(self.style.ERROR(f'Failed {failed} stale job(s) with no attempts left.'))
+
+    def _report(self, job, future):
+        try:
+            status = future.result()
+        except Exception as e:
+            # run_job records task errors itself, so this is the worker failing
+            self.stdout.write(self.style.ERROR(f'Worker error on {job}: {e}'))
+            return
+
+        job.refresh_from_db()
+        if status == Job.SUCCEEDED:
+            self.stdout.write(self.style.SUCCESS(f'Finished {job}: {job.progress_message}'))
+        elif status == Job.QUEUED:
+            self.stdout.write(self.style.WARNING(f'{job} failed, retrying after {job.run_after:%H:%M:%S}'))
+        else:
+            self.stdout.write(self.style.ERROR(f'{job} failed for good:\n{job.last_error}'))
@@ -0,0 +1,100 @@
+# In core/management/commands/startup_profile.py
+
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Boots the WSGI app in a fresh interpreter and times two requests through it.
+# Printed as one JSON line so the command can read it back.
+PROBE = """
+import json, os, time, io
+from wsgiref.util import setup_testing_defaults
+started = time.perf_counter()
+from fastfood_tracker.wsgi import application
+booted = time.perf_counter()
+
+def call(path, token):
+    environ = {'PATH_INFO': path, 'wsgi.errors': io.StringIO()}
+    if token:
+        environ['HTTP_AUTHORIZATION'] = 'Token ' + token
+    setup_testing_defaults(environ)
+    began = time.perf_counter()
+    body = application(environ, lambda status, headers: None)
+    b''.join(body)
+    return time.perf_counter() - began
+
+path, token = os.environ['PROBE_PATH'], os.environ.get('PROBE_TOKEN')
+first = call(path, token)
+second = call(path, token)
+print(json.dumps({'boot': booted - started, 'first': first, 'second': second}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Reports import times and time-to-first-response for a freshly booted worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='How many of the slowest packages to list.')
+        parser.add_argument('--path', default='/api/restaurants/', help='URL to time the first requests against.')
+        parser.add_argument(
+            '--token',
+            help='Auth token to send. Without it the API only answers 401, so the timings are for unauthenticated requests.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('--- Import time per package when booting the WSGI app ---'))
+        self._report_imports(options['top'])
+
+        self.stdout.write(self.style.SUCCESS(f'--- First requests to {options["path"]} ---'))
+        if not options['token']:
+            self.stdout.write(self.style.WARNING(
+                'No --token given: timing the unauthenticated (401) response, not a real API response.'
+            ))
+        self.stdout.write(f'{"":<14}{"boot":>10}{"1st request":>14}{"2nd request":>14}')
+        for label, warmup in (('cold', 'false'), ('warmed', 'true')):
+            result = self._probe(options['path'], options['token'], warmup)
+            self.stdout.write(
+                f'{label:<14}{result["boot"] * 1000:>8.0f}ms'
+                f'{result["first"] * 1000:>12.0f}ms{result["second"] * 1000:>12.0f}ms'
+            )
+
+    def _run(self, args, env_overrides):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'fastfood_tracker.settings')}
+        env.update(env_overrides)
+        return subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        )
+
+    def _report_imports(self, top):
+        result = self._run(
+            ['-X', 'importtime', '-c', 'import fastfood_tracker.wsgi'],
+            {'WARMUP_ON_BOOT': 'true'},
+        )
+        # Lines look like: "import time:  self [us] | cumulative | imported package".
+        # Add up the "self" time per top-level package (django, rest_framework, numpy...).
+        per_package = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            own, _, name = line[len('import time:'):].split('|')
+            if not own.strip().isdigit():
+                continue
+            package = name.strip().split('.')[0]
+            per_package[package] = per_package.get(package, 0) + int(own)
+
+        ranked = sorted(per_package.items(), key=lambda entry: entry[1], reverse=True)
+        for package, microseconds in ranked[:top]:
+            self.stdout.write(f'{microseconds / 1000:>9.1f}ms  {package}')
+        self.stdout.write(f'{sum(per_package.values()) / 1000:>9.1f}ms  total (including warm-up imports)')
+
+    def _probe(self, path, token, warmup):
+        env = {'WARMUP_ON_BOOT': warmup, 'PROBE_PATH': path}
+        if token:
+            env['PROBE_TOKEN'] = token
+        result = self._run(['-c', PROBE], env)
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,68 @@
+# In core/middleware.py
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .db_routers import end_request, request_uses_primary, start_request
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPinMiddleware:
+    """
+    Decides per request whether reads may go to the read replica.
+
+    Writes (POST/PUT/PATCH/DELETE) always use the primary. After a successful
+    write, the same client (identified by its auth token or session cookie)
+    stays on the primary for REPLICA_PIN_SECONDS, so e.g. the tracker right
+    after log_meal shows the new meal even if the replica is lagging.
+
+    The pin is kept in Django's cache, so with several worker processes the
+    cache must be shared (e.g. Redis) for pins to carry across workers.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        is_write = request.method not in SAFE_METHODS
+        pin_key = self._pin_key(request)
+        use_primary = is_write or bool(pin_key and cache.get(pin_key))
+
+        token = start_request(use_primary)
+        try:
+            response = self.get_response(request)
+            # The view may have written and pinned itself to the primary
+            use_primary = request_uses_primary()
+        finally:
+            end_request(token)
+
+        if response.streaming and not response.is_async:
+            # A streaming body (e.g. the history export) runs its queries
+            # after we return, so carry the routing decision along with it
+            response.streaming_content = self._routed(response.streaming_content, use_primary)
+
+        if is_write and pin_key and response.status_code < 400:
+            cache.set(pin_key, True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        return response
+
+    @staticmethod
+    def _routed(content, use_primary):
+        # Set the routing around each step only, so nothing leaks into the
+        # server code that drives the iterator
+        iterator = iter(content)
+        while True:
+            token = start_request(use_primary)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                end_request(token)
+            yield chunk
+
+    def _pin_key(self, request):
+        credential = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not credential:
+            return None
+        return 'replica-pin:' + hashlib.sha256(credential.encode()).hexdigest()
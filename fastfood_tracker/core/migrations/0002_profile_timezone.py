@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='about_me',
+            field=models.TextField(blank=True, help_text='Short bio', null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='favorite_food',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='loggedmeal',
+            index=models.Index(fields=['user', 'created_at'], name='core_logged_user_id_a8bd39_idx'),
+        ),
+    ]
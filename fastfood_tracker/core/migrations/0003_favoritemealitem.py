@@ -0,0 +1,87 @@
+# Moves FavoriteMeal.items onto a through model with quantities
+# and adds cached nutrient totals to FavoriteMeal.
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def copy_favorite_items(apps, schema_editor):
+    """
+    Copies the rows of the old auto-created M2M table into FavoriteMealItem
+    (quantity 1, as before) and fills in the cached totals.
+    """
+    FavoriteMeal = apps.get_model('core', 'FavoriteMeal')
+    FavoriteMealItem = apps.get_model('core', 'FavoriteMealItem')
+    OldThrough = FavoriteMeal.items.through
+    db_alias = schema_editor.connection.alias
+
+    FavoriteMealItem.objects.using(db_alias).bulk_create(
+        FavoriteMealItem(favorite_meal_id=row.favoritemeal_id, menu_item_id=row.menuitem_id, quantity=1)
+        for row in OldThrough.objects.using(db_alias).all()
+    )
+
+    for meal in FavoriteMeal.objects.using(db_alias).all():
+        totals = FavoriteMealItem.objects.using(db_alias).filter(favorite_meal=meal).aggregate(
+            calories=Sum(F('menu_item__calories') * F('quantity')),
+            protein=Sum(F('menu_item__protein') * F('quantity')),
+            fat=Sum(F('menu_item__fat') * F('quantity')),
+            carbs=Sum(F('menu_item__carbohydrates') * F('quantity')),
+        )
+        meal.total_calories = totals['calories'] or 0
+        meal.total_protein = totals['protein'] or 0
+        meal.total_fat = totals['fat'] or 0
+        meal.total_carbs = totals['carbs'] or 0
+        meal.save(update_fields=['total_calories', 'total_protein', 'total_fat', 'total_carbs'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_profile_timezone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FavoriteMealItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('favorite_meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorite_items', to='core.favoritemeal')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.menuitem')),
+            ],
+            options={
+                'unique_together': {('favorite_meal', 'menu_item')},
+            },
+        ),
+        migrations.AddField(
+            model_name='favoritemeal',
+            name='total_calories',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='favoritemeal',
+            name='total_protein',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='favoritemeal',
+            name='total_fat',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='favoritemeal',
+            name='total_carbs',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(copy_favorite_items, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='favoritemeal',
+            name='items',
+        ),
+        migrations.AddField(
+            model_name='favoritemeal',
+            name='items',
+            field=models.ManyToManyField(through='core.FavoriteMealItem', to='core.menuitem'),
+        ),
+    ]
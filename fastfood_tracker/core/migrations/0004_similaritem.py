@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_favoritemealitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('same_category', models.BooleanField(default=False)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField(help_text='Cosine similarity, 1.0 is identical')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_items', to='core.menuitem')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.menuitem')),
+            ],
+            options={
+                'unique_together': {('menu_item', 'same_category', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loggedmeal',
+            index=models.Index(fields=['created_at'], name='core_logged_created_c664cc_idx'),
+        ),
+    ]
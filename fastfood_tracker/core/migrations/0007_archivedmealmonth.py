@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_loggedmeal_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMealMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('meal_count', models.PositiveIntegerField(default=0)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('total_calories', models.FloatField(default=0)),
+                ('total_protein', models.FloatField(default=0)),
+                ('total_fat', models.FloatField(default=0)),
+                ('total_carbs', models.FloatField(default=0)),
+                ('data', models.JSONField(default=dict)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_months', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_archivedmealmonth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestPick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, default='', max_length=100)),
+                ('goal', models.CharField(choices=[('protein_per_calorie', 'Most protein per calorie'), ('low_sodium', 'Lowest sodium'), ('low_sugar', 'Lowest sugar'), ('fiber_density', 'Most fiber per calorie')], max_length=30)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField(help_text='The value ranked on, e.g. grams of protein per calorie')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.menuitem')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_picks', to='core.restaurant')),
+            ],
+            options={
+                'unique_together': {('restaurant', 'category', 'goal', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_bestpick'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='group',
+            field=models.CharField(blank=True, default='', help_text='Jobs in the same group never run at the same time', max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running'), models.Q(('group', ''), _negated=True)), fields=('group',), name='one_running_job_per_group'),
+        ),
+    ]
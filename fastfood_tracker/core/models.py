@@ -1,7 +1,10 @@
 # In core/models.py
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils import timezone
 
 class User(AbstractUser):
     pass
@@ -11,6 +14,13 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+# The per-item nutrient columns, in a fixed order. Used anywhere we treat
+# a menu item as a vector of numbers (similarity, exports, rankings).
+NUTRIENT_FIELDS = (
+    'calories', 'fat', 'sat_fat', 'trans_fat', 'cholesterol', 'sodium',
+    'carbohydrates', 'fiber', 'sugar', 'protein',
+)
+
 class MenuItem(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='menu_items')
     name = models.CharField(max_length=255)
@@ -26,15 +36,75 @@ class MenuItem(models.Model):
     fiber = models.FloatField(default=0)
     sugar = models.FloatField(default=0)
     protein = models.FloatField(default=0)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            # Favorites cache their totals; keep them in step with the nutrients
+            FavoriteMeal.refresh_totals_for(FavoriteMeal.objects.filter(favorite_items__menu_item=self))
+
     def __str__(self):
         return f"{self.name} ({self.restaurant.name})"
 
+class SimilarItem(models.Model):
+    """
+    Precomputed nearest neighbours of a menu item by nutrient profile.
+    Rebuilt by core.similarity after every load_menu_data run.
+    """
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='similar_items')
+    neighbor = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    # True for the list restricted to the item's own category
+    same_category = models.BooleanField(default=False)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField(help_text="Cosine similarity, 1.0 is identical")
+
+    class Meta:
+        # Also serves as the index for "neighbours of X, in rank order"
+        unique_together = ('menu_item', 'same_category', 'rank')
+
+    def __str__(self):
+        return f"{self.menu_item_id} -> {self.neighbor_id} (#{self.rank})"
+
+class BestPick(models.Model):
+    """
+    Precomputed top-N menu items per restaurant (and per category) for a
+    few common goals. Rebuilt by core.rankings after every load_menu_data run.
+    """
+    PROTEIN_PER_CALORIE = 'protein_per_calorie'
+    LOW_SODIUM = 'low_sodium'
+    LOW_SUGAR = 'low_sugar'
+    FIBER_DENSITY = 'fiber_density'
+    GOAL_CHOICES = [
+        (PROTEIN_PER_CALORIE, 'Most protein per calorie'),
+        (LOW_SODIUM, 'Lowest sodium'),
+        (LOW_SUGAR, 'Lowest sugar'),
+        (FIBER_DENSITY, 'Most fiber per calorie'),
+    ]
+
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='best_picks')
+    # Blank means the restaurant's whole menu
+    category = models.CharField(max_length=100, blank=True, default='')
+    goal = models.CharField(max_length=30, choices=GOAL_CHOICES)
+    rank = models.PositiveSmallIntegerField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(help_text="The value ranked on, e.g. grams of protein per calorie")
+
+    class Meta:
+        # Also serves as the index for "best picks for this restaurant and goal"
+        unique_together = ('restaurant', 'category', 'goal', 'rank')
+
+    def __str__(self):
+        return f"{self.restaurant_id} {self.goal} #{self.rank}: {self.menu_item_id}"
+
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     calorie_goal = models.IntegerField(default=2000)
     # --- NEW FIELDS ---
     about_me = models.TextField(blank=True, null=True, help_text="Short bio")
     favorite_food = models.CharField(max_length=100, blank=True, null=True)
+    # IANA name, e.g. 'America/Chicago'. Used to work out where "today" starts.
+    timezone = models.CharField(max_length=64, default='UTC')
 
     def __str__(self):
         return self.user.username
@@ -42,10 +112,69 @@ class Profile(models.Model):
 class FavoriteMeal(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
-    items = models.ManyToManyField(MenuItem)
+    items = models.ManyToManyField(MenuItem, through='FavoriteMealItem')
+    # Cached totals so the favorites list doesn't have to add them up per item.
+    # Kept in sync by refresh_totals() whenever the items change, and by
+    # refresh_totals_for() when menu items change or the catalog is reloaded.
+    total_calories = models.FloatField(default=0)
+    total_protein = models.FloatField(default=0)
+    total_fat = models.FloatField(default=0)
+    total_carbs = models.FloatField(default=0)
+
+    def refresh_totals(self):
+        """
+        Recomputes the cached totals from the stored items in one query.
+        """
+        totals = self.favorite_items.aggregate(
+            calories=Sum(F('menu_item__calories') * F('quantity')),
+            protein=Sum(F('menu_item__protein') * F('quantity')),
+            fat=Sum(F('menu_item__fat') * F('quantity')),
+            carbs=Sum(F('menu_item__carbohydrates') * F('quantity')),
+        )
+        self.total_calories = totals['calories'] or 0
+        self.total_protein = totals['protein'] or 0
+        self.total_fat = totals['fat'] or 0
+        self.total_carbs = totals['carbs'] or 0
+        self.save(update_fields=['total_calories', 'total_protein', 'total_fat', 'total_carbs'])
+
+    @classmethod
+    def refresh_totals_for(cls, favorites):
+        """
+        Recomputes the cached totals of every favorite in the `favorites`
+        queryset with a single UPDATE. Favorites with no items left get 0.
+        Returns the number of favorites updated.
+        """
+        totals = {}
+        for total_field, nutrient in (
+            ('total_calories', 'calories'),
+            ('total_protein', 'protein'),
+            ('total_fat', 'fat'),
+            ('total_carbs', 'carbohydrates'),
+        ):
+            total = (
+                FavoriteMealItem.objects
+                .filter(favorite_meal=OuterRef('pk'))
+                .values('favorite_meal')
+                .annotate(total=Sum(F(f'menu_item__{nutrient}') * F('quantity')))
+                .values('total')
+            )
+            totals[total_field] = Coalesce(Subquery(total), 0.0)
+        return favorites.update(**totals)
 
     def __str__(self):
         return f"'{self.name}' by {self.user.username}"
+
+class FavoriteMealItem(models.Model):
+    # Same idea as LoggedMealItem: links a FavoriteMeal to a MenuItem with a quantity
+    favorite_meal = models.ForeignKey(FavoriteMeal, on_delete=models.CASCADE, related_name="favorite_items")
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('favorite_meal', 'menu_item')
+
+    def __str__(self):
+        return f"{self.quantity} x {self.menu_item.name}"
         
 
 # --- (REMOVED) The old MacroTracker model is gone ---
@@ -59,6 +188,14 @@ class LoggedMeal(models.Model):
     # This automatically captures the exact date and time
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Day/week windows are queried as created_at ranges per user
+            models.Index(fields=['user', 'created_at']),
+            # Admin ordering/date hierarchy across all users
+            models.Index(fields=['created_at']),
+        ]
+
     def __str__(self):
         return f"Meal for {self.user.username} at {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
@@ -72,4 +209,85 @@ class LoggedMealItem(models.Model):
         unique_together = ('logged_meal', 'menu_item') # Prevents duplicate items in the *same* meal
 
     def __str__(self):
-        return f"{self.quantity} x {self.menu_item.name}"
\ No newline at end of file
+        return f"{self.quantity} x {self.menu_item.name}"
+
+class ArchivedMealMonth(models.Model):
+    """
+    One user's meals for one (UTC) calendar month, packed into a single row
+    by the archive_meals command once they are older than the retention
+    horizon. `data` looks like:
+        {"menu_items": {"<id>": {...MenuItemSerializer fields, "restaurant": name}},
+         "meals": [{"id", "name", "created_at", "items": [[menu_item_id, quantity], ...]}]}
+    Menu items are copied in, so the archive survives catalog reloads.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_months")
+    month = models.DateField(help_text="First day of the month")
+    meal_count = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    total_calories = models.FloatField(default=0)
+    total_protein = models.FloatField(default=0)
+    total_fat = models.FloatField(default=0)
+    total_carbs = models.FloatField(default=0)
+    data = models.JSONField(default=dict)
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'month')
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} ({self.meal_count} meals)"
+
+# --- Background jobs (see core/jobs.py and the run_jobs command) ---
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100, help_text="Name of a task registered in core/tasks.py")
+    payload = models.JSONField(default=dict, blank=True, help_text="Keyword arguments for the task")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent done")
+    progress_message = models.CharField(max_length=255, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    # Retries are pushed into the future with a backoff
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True, default='', help_text="Worker running this job")
+    # Touched by the worker while the job runs; see core.jobs.requeue_stale_jobs
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    group = models.CharField(max_length=50, blank=True, default='', help_text="Jobs in the same group never run at the same time")
+
+    class Meta:
+        # The worker polls for "queued and due", oldest first
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        constraints = [
+            # At most one running job per group, enforced by the database so
+            # two workers can't both claim one (see core.jobs.claim_next)
+            models.UniqueConstraint(
+                fields=['group'],
+                condition=models.Q(status='running') & ~models.Q(group=''),
+                name='one_running_job_per_group',
+            ),
+        ]
+
+    def set_progress(self, percent, message=''):
+        self.progress = max(0, min(100, int(percent)))
+        self.progress_message = message[:255]
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress, progress_message=self.progress_message, heartbeat_at=timezone.now(),
+        )
+
+    def __str__(self):
+        return f"#{self.pk} {self.task} ({self.status})"
@@ -0,0 +1,110 @@
+# In core/rankings.py
+"""
+Builds the BestPick table: for each restaurant, and each category within
+it, the top items for a few common goals. The API then serves a ranking
+with one indexed read instead of sorting the menu on every request.
+
+Scores are computed for the whole catalog at once with NumPy, then each
+restaurant/category group is ranked from those arrays.
+
+As in core.similarity, NumPy is imported inside the functions so web
+workers don't load it at boot.
+"""
+from django.db import transaction
+
+from .models import BestPick, MenuItem
+
+# How many items each ranking keeps. The API serves at most this many.
+PICKS_PER_LIST = 10
+
+
+def goal_scores(columns):
+    """
+    Returns {goal: (scores, eligible, higher_is_better)} for the catalog
+    columns (a dict of NumPy arrays keyed by MenuItem field name).
+    """
+    import numpy as np
+
+    calories = columns['calories']
+    has_calories = calories > 0
+    per_calorie = np.where(has_calories, calories, 1.0)
+    # Every goal skips 0-calorie rows: besides water and black coffee they're
+    # catalog placeholders (toys, "Meal Beverages", bags of ice)
+    return {
+        BestPick.PROTEIN_PER_CALORIE: (columns['protein'] / per_calorie, has_calories, True),
+        BestPick.LOW_SODIUM: (columns['sodium'], has_calories, False),
+        BestPick.LOW_SUGAR: (columns['sugar'], has_calories, False),
+        # Grams of fiber per 100 calories
+        BestPick.FIBER_DENSITY: (100 * columns['fiber'] / per_calorie, has_calories, True),
+    }
+
+
+def rank_group(indexes, scores, eligible, higher_is_better, limit):
+    """
+    Returns the positions (into the catalog arrays) of the best `limit`
+    eligible items among `indexes`, best first. Ties go to the lower id,
+    which keeps rebuilds stable.
+    """
+    import numpy as np
+
+    candidates = indexes[eligible[indexes]]
+    if candidates.size == 0:
+        return candidates
+    keys = scores[candidates]
+    if higher_is_better:
+        keys = -keys
+    # np.lexsort sorts by the last key first: score, then position (= id order)
+    order = np.lexsort((candidates, keys))
+    return candidates[order[:limit]]
+
+
+def rebuild_best_picks(limit=PICKS_PER_LIST, progress=None):
+    """
+    Recomputes the whole BestPick table from the current catalog.
+    `progress`, if given, is called with (done, total) per restaurant.
+    Returns the number of rows written.
+    """
+    import numpy as np
+
+    fields = ['calories', 'protein', 'sodium', 'sugar', 'fiber']
+    rows = list(MenuItem.objects.order_by('id').values_list('id', 'restaurant_id', 'category', *fields))
+    to_create = []
+
+    if rows:
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        restaurant_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        categories = np.array([(row[2] or '').strip() for row in rows], dtype=object)
+        columns = {
+            field: np.array([row[3 + offset] for row in rows], dtype=np.float64)
+            for offset, field in enumerate(fields)
+        }
+        goals = goal_scores(columns)
+
+        restaurants = np.unique(restaurant_ids)
+        for done, restaurant_id in enumerate(restaurants, start=1):
+            in_restaurant = np.flatnonzero(restaurant_ids == restaurant_id)
+            # The whole menu (category ''), then each named category
+            groups = [('', in_restaurant)]
+            for category in sorted(set(categories[in_restaurant]) - {''}):
+                groups.append((category, in_restaurant[categories[in_restaurant] == category]))
+
+            for category, indexes in groups:
+                for goal, (scores, eligible, higher_is_better) in goals.items():
+                    best = rank_group(indexes, scores, eligible, higher_is_better, limit)
+                    for rank, position in enumerate(best, start=1):
+                        to_create.append(BestPick(
+                            restaurant_id=int(restaurant_id),
+                            category=category,
+                            goal=goal,
+                            rank=rank,
+                            menu_item_id=int(ids[position]),
+                            score=float(scores[position]),
+                        ))
+
+            if progress:
+                progress(done, len(restaurants))
+
+    with transaction.atomic():
+        BestPick.objects.all().delete()
+        BestPick.objects.bulk_create(to_create, batch_size=1000)
+    return len(to_create)
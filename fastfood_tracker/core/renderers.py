@@ -0,0 +1,58 @@
+# In core/renderers.py
+"""
+Renderers for the history export. The export view streams its own body,
+so these mostly exist so DRF accepts ?format=csv / ?format=ndjson. They
+only render small payloads such as error messages.
+"""
+import csv
+import io
+import json
+
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        if rows:
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        lines = [json.dumps(row, cls=JSONEncoder) + '\n' for row in rows]
+        return ''.join(lines).encode(self.charset)
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    Picks the first renderer (CSV) instead of answering 406 when the Accept
+    header matches none of them, e.g. a client that always sends
+    Accept: application/json. An unknown ?format= is still a 404.
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            renderer = renderers[0]
+            return renderer, renderer.media_type
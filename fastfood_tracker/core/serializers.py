@@ -1,10 +1,13 @@
 # In core/serializers.py
 
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from rest_framework import serializers
 # R: Make sure all models, including the new ones, are imported
 from .models import (
     User, Restaurant, MenuItem, Profile, 
-    FavoriteMeal, LoggedMeal, LoggedMealItem
+    FavoriteMeal, FavoriteMealItem, LoggedMeal, LoggedMealItem,
+    SimilarItem, BestPick
 )
 
 # --- User & Profile Serializers (No Change) ---
@@ -17,27 +20,83 @@ class UserSerializer(serializers.ModelSerializer):
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
-        fields = ['calorie_goal', 'about_me', 'favorite_food']
+        fields = ['calorie_goal', 'about_me', 'favorite_food', 'timezone']
+
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError('Unknown timezone. Use an IANA name like "America/Chicago".')
+        return value
 
 # --- Restaurant & Menu Serializers (No Change) ---
 class MenuItemSerializer(serializers.ModelSerializer):
+    """
+    Pass fields=[...] to only output some of the fields (used for ?fields=).
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = MenuItem
         fields = ['id', 'name', 'category', 'serving_size', 'calories', 'fat', 'sat_fat', 'trans_fat', 'cholesterol', 'sodium', 'carbohydrates', 'fiber', 'sugar', 'protein']
 
+class SimilarItemSerializer(serializers.ModelSerializer):
+    """
+    One precomputed neighbour: its rank, how close it is, and the item itself.
+    """
+    menu_item = MenuItemSerializer(source='neighbor', read_only=True)
+
+    class Meta:
+        model = SimilarItem
+        fields = ['rank', 'score', 'menu_item']
+
+class BestPickSerializer(serializers.ModelSerializer):
+    """
+    One entry of a precomputed ranking.
+    """
+    menu_item = MenuItemSerializer(read_only=True)
+
+    class Meta:
+        model = BestPick
+        fields = ['rank', 'score', 'menu_item']
+
 class RestaurantSerializer(serializers.ModelSerializer):
     menu_items = MenuItemSerializer(many=True, read_only=True)
     class Meta:
         model = Restaurant
         fields = ['id', 'name', 'menu_items']
 
-# --- Favorite Meal Serializer (No Change) ---
+# --- Favorite Meal Serializers ---
+class FavoriteMealItemSerializer(serializers.ModelSerializer):
+    """
+    A stored favorite row, in the same {"id", "quantity"} shape
+    that log_meal and the favorites endpoint accept.
+    """
+    id = serializers.IntegerField(source='menu_item_id', read_only=True)
+
+    class Meta:
+        model = FavoriteMealItem
+        fields = ['id', 'quantity']
+
 class FavoriteMealSerializer(serializers.ModelSerializer):
-    items = MenuItemSerializer(many=True, read_only=True)
+    # Both lists are built from the prefetched 'favorite_items' rows,
+    # so a whole page of favorites costs a fixed number of queries.
+    items = serializers.SerializerMethodField()
+    favorite_items = FavoriteMealItemSerializer(many=True, read_only=True)
     
     class Meta:
         model = FavoriteMeal
-        fields = ['id', 'name', 'items']
+        fields = ['id', 'name', 'items', 'favorite_items',
+                  'total_calories', 'total_protein', 'total_fat', 'total_carbs']
+        read_only_fields = ['total_calories', 'total_protein', 'total_fat', 'total_carbs']
+
+    def get_items(self, obj):
+        menu_items = [row.menu_item for row in obj.favorite_items.all()]
+        return MenuItemSerializer(menu_items, many=True).data
 
 
 # --- (REMOVED) Old Tracker Serializer ---
@@ -0,0 +1,104 @@
+# In core/similarity.py
+"""
+Builds the SimilarItem table: for every menu item, its closest items by
+nutrient profile.
+
+Each item becomes a vector of its NUTRIENT_FIELDS. Columns are standardised
+(z-scores) so sodium in mg doesn't drown out protein in g, then rows are
+scaled to unit length so a dot product is the cosine similarity. Similarities
+are computed a block of rows at a time to keep memory bounded.
+
+NumPy is imported inside the functions: web workers import this module for
+NEIGHBORS_PER_ITEM but never rebuild, so they shouldn't pay for it at boot.
+"""
+from django.db import transaction
+
+from .models import MenuItem, SimilarItem, NUTRIENT_FIELDS
+
+# How many neighbours we store per item (and per list). The API serves
+# at most this many, after any filtering.
+NEIGHBORS_PER_ITEM = 25
+BLOCK_SIZE = 512
+
+
+def build_vectors(rows):
+    """
+    Turns (id, category, *nutrients) rows into ids, categories and a matrix
+    of unit-length, standardised nutrient vectors.
+    """
+    import numpy as np
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    categories = np.array([(row[1] or '').strip().lower() for row in rows], dtype=object)
+    matrix = np.array([row[2:] for row in rows], dtype=np.float64)
+
+    std = matrix.std(axis=0)
+    std[std == 0] = 1.0
+    matrix = (matrix - matrix.mean(axis=0)) / std
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return ids, categories, matrix / norms
+
+
+def top_neighbors(scores, k):
+    """
+    Returns the column indexes of the k highest scores in each row, best first.
+    Scores of -inf are never returned.
+    """
+    import numpy as np
+
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return [[] for _ in range(scores.shape[0])]
+    picked = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    picked_scores = np.take_along_axis(scores, picked, axis=1)
+    order = np.argsort(-picked_scores, axis=1)
+    picked = np.take_along_axis(picked, order, axis=1)
+    picked_scores = np.take_along_axis(picked_scores, order, axis=1)
+    return [row[np.isfinite(row_scores)] for row, row_scores in zip(picked, picked_scores)]
+
+
+def rebuild_similar_items(k=NEIGHBORS_PER_ITEM, block_size=BLOCK_SIZE, progress=None):
+    """
+    Recomputes the whole SimilarItem table from the current catalog.
+    `progress`, if given, is called with (done, total) after each block.
+    Returns the number of rows written.
+    """
+    import numpy as np
+
+    rows = list(MenuItem.objects.order_by('id').values_list('id', 'category', *NUTRIENT_FIELDS))
+    to_create = []
+
+    if len(rows) > 1:
+        ids, categories, vectors = build_vectors(rows)
+        total = len(ids)
+
+        for start in range(0, total, block_size):
+            stop = min(start + block_size, total)
+            scores = vectors[start:stop] @ vectors.T
+            # An item is never its own neighbour
+            scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+            same = categories[start:stop, None] == categories[None, :]
+            category_scores = np.where(same, scores, -np.inf)
+
+            for same_category, block_scores in ((False, scores), (True, category_scores)):
+                for offset, neighbors in enumerate(top_neighbors(block_scores, k)):
+                    row = start + offset
+                    for rank, col in enumerate(neighbors, start=1):
+                        to_create.append(SimilarItem(
+                            menu_item_id=int(ids[row]),
+                            neighbor_id=int(ids[col]),
+                            same_category=same_category,
+                            rank=rank,
+                            score=float(block_scores[offset, col]),
+                        ))
+
+            if progress:
+                progress(stop, total)
+
+    with transaction.atomic():
+        SimilarItem.objects.all().delete()
+        SimilarItem.objects.bulk_create(to_create, batch_size=1000)
+    return len(to_create)
@@ -0,0 +1,67 @@
+# In core/tasks.py
+"""
+Background tasks for the job queue. Queue them with core.jobs.enqueue()
+and process them with `python manage.py run_jobs`.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .archive import archive_meals
+from .catalog import DEFAULT_CSV_PATH, load_menu_csv
+from .jobs import task
+from .rankings import rebuild_best_picks
+from .similarity import rebuild_similar_items
+
+# Tasks that replace or read the whole catalog. Run one at a time, so a
+# rebuild never reads a half-loaded catalog or writes rows for menu items
+# a reload just deleted.
+CATALOG = 'catalog'
+
+
+# Not retried: a bad CSV fails the same way every time, and a reload wipes
+# every user's logged items, so an admin should decide to run it again.
+@task('load_menu_data', max_attempts=1, group=CATALOG)
+def load_menu_data(job, csv_file_path=DEFAULT_CSV_PATH):
+    """
+    Reloads the catalog from the CSV, then rebuilds everything derived from it.
+    """
+    job.set_progress(0, 'Loading menu items')
+    item_count = load_menu_csv(
+        csv_file_path,
+        progress=lambda done, total: job.set_progress(
+            80 * done / total, f'Loaded {total} menu items' if done == total else f'Replacing the catalog ({total} items)',
+        ),
+    )
+    job.set_progress(80, 'Rebuilding similar items')
+    rebuild_similar_items()
+    job.set_progress(90, 'Rebuilding best picks')
+    rebuild_best_picks()
+    job.set_progress(100, f'Loaded {item_count} menu items')
+
+
+@task('rebuild_similar_items', group=CATALOG)
+def rebuild_similar_items_task(job):
+    count = rebuild_similar_items(
+        progress=lambda done, total: job.set_progress(100 * done / total, f'Indexed {done}/{total} items'),
+    )
+    job.set_progress(100, f'Wrote {count} neighbour rows')
+
+
+@task('rebuild_best_picks', group=CATALOG)
+def rebuild_best_picks_task(job):
+    count = rebuild_best_picks(
+        progress=lambda done, total: job.set_progress(100 * done / total, f'Ranked {done}/{total} restaurants'),
+    )
+    job.set_progress(100, f'Wrote {count} best-pick rows')
+
+
+@task('archive_meals')
+def archive_meals_task(job, older_than_days=None):
+    days = older_than_days if older_than_days is not None else settings.MEAL_ARCHIVE_AFTER_DAYS
+    moved = archive_meals(
+        timezone.now() - timedelta(days=days),
+        progress=lambda done, total: job.set_progress(100 * done / total, f'Archived {done}/{total} user-months'),
+    )
+    job.set_progress(100, f'Archived {moved} meals')
@@ -1,3 +1,604 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .archive import archive_meals
+from .catalog import DEFAULT_CSV_PATH, load_menu_csv
+from .db_routers import replica_alias
+from .jobs import (
+    RETRY_BACKOFF_SECONDS, STALE_AFTER, TASK_OPTIONS, TASKS,
+    claim_next, enqueue, heartbeat, requeue_stale_jobs, run_job, task,
+)
+from .models import (
+    User, Restaurant, MenuItem, Profile, FavoriteMeal, LoggedMeal, LoggedMealItem,
+    ArchivedMealMonth, SimilarItem, BestPick, Job
+)
+from .rankings import rebuild_best_picks
+from .views import MenuItemViewSet
+
+
+def _succeeds(job):
+    job.set_progress(50, 'Halfway')
+
+
+def _fails(job):
+    raise RuntimeError('Boom')
+
+
+# run_job closes its connection when it's done, which a TestCase transaction
+# wouldn't survive, so these tests commit for real.
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        for registry in (TASKS, TASK_OPTIONS):
+            patcher = mock.patch.dict(registry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        task('test_succeeds')(_succeeds)
+        task('test_fails', max_attempts=3)(_fails)
+        task('test_catalog_a', group='test')(_succeeds)
+        task('test_catalog_b', group='test')(_succeeds)
+
+    def test_claim_next_takes_due_jobs_oldest_first_and_only_once(self):
+        first = enqueue('test_succeeds')
+        second = enqueue('test_succeeds')
+        later = enqueue('test_succeeds')
+        Job.objects.filter(pk=later.pk).update(run_after=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(claim_next('worker-1').pk, first.pk)
+        self.assertEqual(claim_next('worker-2').pk, second.pk)
+        self.assertIsNone(claim_next('worker-1'))
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, Job.RUNNING)
+        self.assertEqual(first.locked_by, 'worker-1')
+
+    def test_claim_next_runs_one_job_per_group(self):
+        first = enqueue('test_catalog_a')
+        second = enqueue('test_catalog_b')
+        other = enqueue('test_succeeds')
+
+        self.assertEqual(claim_next('worker-1').pk, first.pk)
+        # The group is busy, so the ungrouped job is next
+        self.assertEqual(claim_next('worker-2').pk, other.pk)
+        self.assertIsNone(claim_next('worker-2'))
+
+        run_job(first.pk)
+        self.assertEqual(claim_next('worker-2').pk, second.pk)
+
+    def test_enqueue_unique_returns_queued_or_running_job(self):
+        job = enqueue('test_succeeds', unique=True)
+        self.assertEqual(enqueue('test_succeeds', unique=True).pk, job.pk)
+        claim_next('worker-1')
+        self.assertEqual(enqueue('test_succeeds', unique=True).pk, job.pk)
+        run_job(job.pk)
+        self.assertNotEqual(enqueue('test_succeeds', unique=True).pk, job.pk)
+
+    def test_run_job_records_success(self):
+        job = enqueue('test_succeeds')
+        claim_next('worker-1')
+
+        self.assertEqual(run_job(job.pk), Job.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.progress_message, 'Halfway')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_run_job_retries_with_backoff_until_out_of_attempts(self):
+        job = enqueue('test_fails')
+
+        for attempt in (1, 2):
+            claim_next('worker-1')
+            before = timezone.now()
+            self.assertEqual(run_job(job.pk), Job.QUEUED)
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('Boom', job.last_error)
+            self.assertEqual(job.locked_by, '')
+            backoff = timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            self.assertGreaterEqual(job.run_after, before + backoff)
+            self.assertLess(job.run_after, before + backoff + timedelta(seconds=5))
+
+            # Not due yet, then make it due for the next attempt
+            self.assertIsNone(claim_next('worker-1'))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        claim_next('worker-1')
+        self.assertEqual(run_job(job.pk), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(claim_next('worker-1'))
+
+    def test_long_running_job_with_a_heartbeat_is_not_stale(self):
+        job = enqueue('test_succeeds')
+        claim_next('worker-1')
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=3))
+
+        self.assertEqual(heartbeat('worker-1', [job.pk]), 1)
+        self.assertEqual(requeue_stale_jobs(), (0, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        # Another worker can't keep it alive
+        self.assertEqual(heartbeat('worker-2', [job.pk]), 0)
+
+    def test_stale_jobs_are_requeued_or_failed_when_out_of_attempts(self):
+        retry = enqueue('test_fails')
+        claim_next('worker-1')
+        out_of_attempts = enqueue('test_fails')
+        claim_next('worker-1')
+        Job.objects.filter(pk=out_of_attempts.pk).update(attempts=3)
+        Job.objects.update(heartbeat_at=timezone.now() - STALE_AFTER - timedelta(seconds=1))
+
+        self.assertEqual(requeue_stale_jobs(), (1, 1))
+        retry.refresh_from_db()
+        self.assertEqual(retry.status, Job.QUEUED)
+        self.assertEqual(retry.locked_by, '')
+        out_of_attempts.refresh_from_db()
+        self.assertEqual(out_of_attempts.status, Job.FAILED)
+        self.assertIsNotNone(out_of_attempts.finished_at)
+        self.assertEqual(claim_next('worker-2').pk, retry.pk)
+
+
+class LoadMenuDataTaskTests(TransactionTestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name='Old Place')
+        self.menu_item = MenuItem.objects.create(restaurant=restaurant, name='Burger', calories=500)
+        user = User.objects.create_user(username='eater', password='secret')
+        meal = LoggedMeal.objects.create(user=user, name='Lunch')
+        LoggedMealItem.objects.create(logged_meal=meal, menu_item=self.menu_item)
+
+    def _write_csv(self, content):
+        file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        self.addCleanup(os.remove, file.name)
+        with file:
+            file.write(content)
+        return file.name
+
+    def test_unusable_csv_fails_once_and_keeps_the_catalog_and_history(self):
+        csv_path = self._write_csv(
+            'Restaurant,Item,calories\n'
+            'New Place,Bacon, 150g\n'
+        )
+        job = enqueue('load_menu_data', csv_file_path=csv_path)
+        claim_next('worker-1')
+
+        self.assertEqual(run_job(job.pk), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('No usable rows', job.last_error)
+        self.assertEqual(list(MenuItem.objects.values_list('name', flat=True)), ['Burger'])
+        self.assertEqual(LoggedMealItem.objects.count(), 1)
+
+    def test_good_csv_replaces_the_catalog_and_skips_bad_rows(self):
+        csv_path = self._write_csv(
+            'Restaurant,Item,calories,protein\n'
+            'New Place,Fries,300,4\n'
+            'New Place,Bacon, 150g,3\n'
+            'New Place,Shake,600,12\n'
+        )
+        job = enqueue('load_menu_data', csv_file_path=csv_path)
+        claim_next('worker-1')
+
+        self.assertEqual(run_job(job.pk), Job.SUCCEEDED)
+        self.assertEqual(sorted(MenuItem.objects.values_list('name', flat=True)), ['Fries', 'Shake'])
+
+    def test_progress_is_reported_outside_the_transaction(self):
+        csv_path = self._write_csv('Restaurant,Item,calories\nNew Place,Fries,300\n')
+        in_transaction = []
+
+        load_menu_csv(csv_path, progress=lambda done, total: in_transaction.append(connection.in_atomic_block))
+
+        # Written inside the transaction, job progress would only show up at commit
+        self.assertEqual(in_transaction, [False, False])
+
+    def test_shipped_csv_loads(self):
+        messages = []
+        count = load_menu_csv(DEFAULT_CSV_PATH, log=messages.append)
+
+        # Only the McDonald's rows with shifted columns at the end are skipped
+        self.assertEqual(count, 413)
+        self.assertEqual(MenuItem.objects.count(), 413)
+        self.assertEqual(sum(message.startswith('Skipped') for message in messages), 7)
+
+
+class LoadMenuDataCommandTests(TestCase):
+    """
+    run_deploy.sh runs `load_menu_data` on every deploy.
+    """
+    def test_deploy_run_fills_the_derived_tables(self):
+        call_command('load_menu_data', stdout=StringIO())
+
+        self.assertEqual(MenuItem.objects.count(), 413)
+        self.assertTrue(SimilarItem.objects.exists())
+        self.assertTrue(BestPick.objects.exists())
+
+    def test_failed_load_still_rebuilds_from_the_current_catalog(self):
+        restaurant = Restaurant.objects.create(name='Burger Place')
+        for name, calories in (('Burger', 500), ('Fries', 300), ('Shake', 600)):
+            MenuItem.objects.create(restaurant=restaurant, name=name, calories=calories)
+
+        with mock.patch('core.management.commands.load_menu_data.load_menu_csv', side_effect=ValueError('Bad file')):
+            call_command('load_menu_data', stdout=StringIO())
+
+        self.assertEqual(MenuItem.objects.count(), 3)
+        self.assertTrue(SimilarItem.objects.exists())
+        self.assertTrue(BestPick.objects.exists())
+
+
+class BestPickTests(TestCase):
+    def test_zero_calorie_placeholders_are_never_picked(self):
+        restaurant = Restaurant.objects.create(name='Chicken Place')
+        for name, calories, sodium, sugar in (
+            ('Prize', 0, 0, 0),
+            ('Nuggets', 250, 900, 1),
+            ('Salad', 150, 300, 5),
+        ):
+            MenuItem.objects.create(restaurant=restaurant, name=name, calories=calories, sodium=sodium, sugar=sugar)
+
+        rebuild_best_picks()
+
+        for goal in (BestPick.LOW_SODIUM, BestPick.LOW_SUGAR, BestPick.PROTEIN_PER_CALORIE):
+            picked = BestPick.objects.filter(restaurant=restaurant, category='', goal=goal).values_list('menu_item__name', flat=True)
+            self.assertNotIn('Prize', picked, goal)
+        self.assertEqual(
+            list(BestPick.objects.filter(goal=BestPick.LOW_SUGAR, category='').order_by('rank').values_list('menu_item__name', flat=True)),
+            ['Nuggets', 'Salad'],
+        )
+
+
+class ArchiveRoundTripTests(TestCase):
+    """
+    Archiving must not change what a user sees in their history or export.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='eater', password='secret')
+        Profile.objects.create(user=self.user, timezone='America/Chicago')
+        other = User.objects.create_user(username='other', password='secret')
+
+        restaurant = Restaurant.objects.create(name='Burger Place')
+        burger = MenuItem.objects.create(restaurant=restaurant, name='Burger', category='Entree', calories=500, protein=25)
+        fries = MenuItem.objects.create(restaurant=restaurant, name='Fries', category='Side', calories=300, fat=15)
+
+        # Spread over several months, including one just after a UTC month
+        # boundary that is still the previous month in Chicago
+        for user, name, created_at, items in (
+            (self.user, 'Old lunch', datetime(2023, 1, 10, 18, 0), [(burger, 1), (fries, 2)]),
+            (self.user, 'Month edge', datetime(2023, 2, 1, 3, 0), [(fries, 1)]),
+            (self.user, 'Old dinner', datetime(2023, 2, 14, 1, 30), [(burger, 2)]),
+            (self.user, None, datetime(2023, 3, 5, 12, 0), [(burger, 1)]),
+            (self.user, 'Recent', timezone.now() - timedelta(days=2), [(fries, 3)]),
+            (other, 'Not mine', datetime(2023, 1, 11, 12, 0), [(burger, 1)]),
+        ):
+            meal = LoggedMeal.objects.create(user=user, name=name)
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=dt_timezone.utc)
+            LoggedMeal.objects.filter(pk=meal.pk).update(created_at=created_at)
+            for menu_item, quantity in items:
+                LoggedMealItem.objects.create(logged_meal=meal, menu_item=menu_item, quantity=quantity)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _snapshot(self):
+        history = {
+            query: self.client.get('/api/history/' + query).json()
+            for query in ('', '?start=2023-01-31', '?end=2023-01-31', '?start=2023-02-01&end=2023-02-28')
+        }
+        exports = {
+            format: b''.join(self.client.get(f'/api/history/export/?format={format}').streaming_content)
+            for format in ('csv', 'ndjson')
+        }
+        return history, exports
+
+    def test_history_and_export_unchanged_by_archiving(self):
+        history_before, exports_before = self._snapshot()
+        self.assertEqual(len(history_before['']), 5)
+        # "Month edge" is Jan 31 in Chicago
+        self.assertEqual([meal['name'] for meal in history_before['?end=2023-01-31']], ['Month edge', 'Old lunch'])
+
+        moved = archive_meals(datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(moved, 5)
+        self.assertEqual(LoggedMeal.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(ArchivedMealMonth.objects.filter(user=self.user).count(), 3)
+        history_after, exports_after = self._snapshot()
+        self.assertEqual(history_after, history_before)
+        self.assertEqual(exports_after, exports_before)
+
+    def test_archive_totals_and_merging(self):
+        archive_meals(datetime(2023, 2, 10, tzinfo=dt_timezone.utc))
+        february = ArchivedMealMonth.objects.get(user=self.user, month='2023-02-01')
+        self.assertEqual((february.meal_count, february.item_count, february.total_calories), (1, 1, 300))
+
+        # A later run adds the rest of the month to the same row
+        archive_meals(datetime(2023, 3, 1, tzinfo=dt_timezone.utc))
+        february.refresh_from_db()
+        self.assertEqual((february.meal_count, february.item_count, february.total_calories), (2, 3, 1300))
+        self.assertEqual(
+            [meal['name'] for meal in february.data['meals']],
+            ['Month edge', 'Old dinner'],
+        )
+
+
+
+class FavoriteMealTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='eater', password='secret')
+        restaurant = Restaurant.objects.create(name='Burger Place')
+        self.burger = MenuItem.objects.create(restaurant=restaurant, name='Burger', category='Entree', calories=500, protein=25)
+        self.fries = MenuItem.objects.create(restaurant=restaurant, name='Fries', category='Side', calories=300, fat=15)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create(self, **data):
+        return self.client.post('/api/favorites/', {'name': 'Usual', **data}, format='json')
+
+    def test_items_with_quantities(self):
+        response = self._create(items=[{'id': self.burger.pk, 'quantity': 2}, {'id': self.fries.pk}])
+        self.assertEqual(response.status_code, 201)
+        favorite = response.json()
+        self.assertEqual(
+            sorted((row['id'], row['quantity']) for row in favorite['favorite_items']),
+            [(self.burger.pk, 2), (self.fries.pk, 1)],
+        )
+        self.assertEqual((favorite['total_calories'], favorite['total_protein'], favorite['total_fat']), (1300, 50, 15))
+
+        logged = self.client.post(f"/api/favorites/{favorite['id']}/log/").json()
+        self.assertEqual(sorted(item['quantity'] for item in logged['logged_items']), [1, 2])
+
+    def test_quantity_below_one_is_a_400(self):
+        for quantity in (0, -1):
+            response = self._create(items=[{'id': self.burger.pk, 'quantity': quantity}])
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(FavoriteMeal.objects.exists())
+
+    def test_repeated_item_ids_count_as_quantity(self):
+        favorite = self._create(item_ids=[self.burger.pk, self.burger.pk, self.fries.pk]).json()
+        self.assertEqual(
+            sorted((row['id'], row['quantity']) for row in favorite['favorite_items']),
+            [(self.burger.pk, 2), (self.fries.pk, 1)],
+        )
+        self.assertEqual(favorite['total_calories'], 1300)
+
+    def test_totals_follow_menu_item_edits(self):
+        favorite = self._create(items=[{'id': self.burger.pk, 'quantity': 2}]).json()
+        self.burger.calories = 450
+        self.burger.save()
+        response = self.client.get(f"/api/favorites/{favorite['id']}/")
+        self.assertEqual(response.json()['total_calories'], 900)
+
+    def test_totals_follow_a_catalog_reload(self):
+        favorite = self._create(items=[{'id': self.burger.pk, 'quantity': 2}]).json()
+        file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        self.addCleanup(os.remove, file.name)
+        with file:
+            file.write('Restaurant,Item,calories\nNew Place,Salad,200\n')
+
+        load_menu_csv(file.name)
+
+        # The reload replaces every menu item, so the favorite is left empty
+        response = self.client.get(f"/api/favorites/{favorite['id']}/").json()
+        self.assertEqual(response['favorite_items'], [])
+        self.assertEqual(response['total_calories'], 0)
+
+    def test_list_is_two_queries(self):
+        for name in ('Lunch', 'Dinner', 'Snack'):
+            self._create(name=name, items=[{'id': self.burger.pk, 'quantity': 1}, {'id': self.fries.pk, 'quantity': 2}])
+        # The favorites, then their items with the menu items joined in
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/favorites/')
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(len(response.json()[0]['items']), 2)
+
+
+class MenuItemFieldsAndIdsTests(TestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name='Burger Place')
+        self.burger = MenuItem.objects.create(restaurant=restaurant, name='Burger', category='Entree', calories=500, sodium=900)
+        self.fries = MenuItem.objects.create(restaurant=restaurant, name='Fries', category='Side', calories=300, sodium=200)
+        MenuItem.objects.create(restaurant=restaurant, name='Shake', category='Drink', calories=600)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='eater', password='secret'))
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        item_queries = [q['sql'] for q in queries.captured_queries if 'core_menuitem' in q['sql']]
+        return response, item_queries
+
+    def test_list_fields_reads_only_those_columns(self):
+        response, item_queries = self._get('/api/items/?fields=calories,name&ordering=name')
+        self.assertEqual(response.status_code, 200)
+        # Serializer order, whatever the request order
+        self.assertEqual(response.json()[0], {'name': 'Burger', 'calories': 500})
+        self.assertEqual(len(item_queries), 1)
+        self.assertNotIn('sodium', item_queries[0])
+        self.assertNotIn('core_restaurant', item_queries[0])
+
+    def test_retrieve_fields_reads_only_those_columns(self):
+        response, item_queries = self._get(f'/api/items/{self.fries.pk}/?fields=id,sodium')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': self.fries.pk, 'sodium': 200})
+        self.assertEqual(len(item_queries), 1)
+        self.assertNotIn('calories', item_queries[0])
+
+    def test_unknown_field_is_a_400(self):
+        response = self.client.get('/api/items/?fields=name,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['fields'])
+        response = self.client.get(f'/api/items/{self.burger.pk}/?fields=secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_ids_fetches_just_those_items(self):
+        response = self.client.get(f'/api/items/?ids={self.burger.pk},{self.fries.pk},{self.fries.pk}&fields=name&ordering=name')
+        self.assertEqual(response.json(), [{'name': 'Burger'}, {'name': 'Fries'}])
+        self.assertEqual(self.client.get('/api/items/?ids=1,two').status_code, 400)
+
+    def test_ids_limit(self):
+        ids = ','.join(str(n) for n in range(1, MenuItemViewSet.MAX_IDS + 1))
+        self.assertEqual(self.client.get(f'/api/items/?ids={ids}').status_code, 200)
+        response = self.client.get(f'/api/items/?ids={ids},{MenuItemViewSet.MAX_IDS + 1}')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ids', response.json())
+
+
+class HistoryExportTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='eater', password='secret')
+        restaurant = Restaurant.objects.create(name='Café Place')
+        crepe = MenuItem.objects.create(restaurant=restaurant, name='Crêpe', category='Dessert', calories=400)
+        meal = LoggedMeal.objects.create(user=user, name='Snack')
+        LoggedMealItem.objects.create(logged_meal=meal, menu_item=crepe, quantity=1)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def _export(self, url, **headers):
+        response = self.client.get(url, **headers)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_formats_declare_utf8(self):
+        response, body = self._export('/api/history/export/?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('Crêpe', body)
+        response, body = self._export('/api/history/export/?format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(json.loads(body.splitlines()[0])['item_name'], 'Crêpe')
+
+    def test_unmatched_accept_header_gets_csv(self):
+        response, body = self._export('/api/history/export/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('Crêpe', body)
+        response, body = self._export('/api/history/export/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+
+
+class LocalDayBoundaryTests(TestCase):
+    """
+    "Today" in the tracker and history runs midnight to midnight in the user's
+    timezone, including on a 23-hour DST day.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='eater', password='secret')
+        Profile.objects.create(user=self.user, timezone='America/Chicago')
+        restaurant = Restaurant.objects.create(name='Burger Place')
+        burger = MenuItem.objects.create(restaurant=restaurant, name='Burger', category='Entree', calories=500)
+
+        # Chicago springs forward on 2023-03-12: that day starts at 06:00 UTC
+        # (CST) and ends at 05:00 UTC the next day (CDT)
+        for name, created_at in (
+            ('Day before', datetime(2023, 3, 12, 5, 59)),
+            ('Midnight', datetime(2023, 3, 12, 6, 0)),
+            ('Last minute', datetime(2023, 3, 13, 4, 59)),
+            ('Day after', datetime(2023, 3, 13, 5, 0)),
+        ):
+            meal = LoggedMeal.objects.create(user=self.user, name=name)
+            LoggedMeal.objects.filter(pk=meal.pk).update(created_at=created_at.replace(tzinfo=dt_timezone.utc))
+            LoggedMealItem.objects.create(logged_meal=meal, menu_item=burger, quantity=1)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_tracker_counts_local_midnight_to_midnight_on_a_dst_day(self):
+        now = datetime(2023, 3, 12, 18, 0, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            response = self.client.get('/api/tracker/')
+        self.assertEqual(response.json()['consumed']['calories'], 1000)
+
+    def test_tracker_just_after_local_midnight(self):
+        # 00:00 CDT on the 13th: the DST day's meals no longer count
+        now = datetime(2023, 3, 13, 5, 0, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            response = self.client.get('/api/tracker/')
+        self.assertEqual(response.json()['consumed']['calories'], 500)
+
+    def test_history_range_on_a_dst_day(self):
+        response = self.client.get('/api/history/?start=2023-03-12&end=2023-03-12')
+        self.assertEqual([meal['name'] for meal in response.json()], ['Last minute', 'Midnight'])
+        response = self.client.get('/api/history/?start=2023-03-13')
+        self.assertEqual([meal['name'] for meal in response.json()], ['Day after'])
+
+
+# None unless REPLICA_DATABASE_URL is set
+REPLICA = replica_alias()
+
+
+# Needs a second database, e.g.
+#   REPLICA_DATABASE_URL=sqlite:///replica.sqlite3 python manage.py test core
+# Each alias gets its own test database and nothing copies rows between them,
+# so which one answered shows in the data. TransactionTestCase because the
+# router keeps reads on the primary inside a transaction, which a TestCase
+# always is.
+@skipUnless(REPLICA, 'Set REPLICA_DATABASE_URL to test read replica routing.')
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', REPLICA} if REPLICA else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='eater', password='secret')
+        Profile.objects.create(user=self.user)
+        token = Token.objects.create(user=self.user)
+        # The same user exists on the replica, as it would after replication
+        User.objects.using(REPLICA).create(pk=self.user.pk, username='eater')
+
+        Restaurant.objects.create(name='On primary')
+        Restaurant.objects.using(REPLICA).create(name='On replica')
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _restaurant_names(self, client=None):
+        response = (client or self.client).get('/api/restaurants/')
+        self.assertEqual(response.status_code, 200)
+        return [restaurant['name'] for restaurant in response.json()]
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self._restaurant_names(), ['On replica'])
+
+    def test_get_after_write_reads_from_primary(self):
+        response = self.client.put('/api/profile/', {'calorie_goal': 1800, 'timezone': 'UTC'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self._restaurant_names(), ['On primary'])
+
+        # Only the client that wrote is pinned
+        other = User.objects.create_user(username='other', password='secret')
+        other_client = APIClient()
+        other_client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+        self.assertEqual(self._restaurant_names(other_client), ['On replica'])
+
+        # And only until the pin runs out
+        cache.clear()
+        self.assertEqual(self._restaurant_names(), ['On replica'])
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.put('/api/profile/', {'timezone': 'Not/AZone'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self._restaurant_names(), ['On replica'])
+
+    def test_streamed_export_reads_from_replica(self):
+        restaurant = Restaurant.objects.using(REPLICA).get()
+        menu_item = MenuItem.objects.using(REPLICA).create(restaurant=restaurant, name='Burger')
+        meal = LoggedMeal.objects.using(REPLICA).create(user_id=self.user.pk, name='Replica lunch')
+        LoggedMealItem.objects.using(REPLICA).create(logged_meal=meal, menu_item=menu_item)
+
+        response = self.client.get('/api/history/export/?format=ndjson')
+
+        self.assertIn(b'"Replica lunch"', b''.join(response.streaming_content))
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(list(Restaurant.objects.values_list('name', flat=True)), ['On primary'])
@@ -26,6 +26,7 @@ urlpatterns = [
     path('tracker/', views.get_daily_tracker, name='tracker'),
     path('log_meal/', views.log_meal, name='log_meal'),
     path('history/', views.get_meal_history, name='history'),
+    path('history/export/', views.export_meal_history, name='history_export'),
     # --- NEW URL ---
     path('random_meal/', views.generate_random_meal, name='random_meal'),
 ]
\ No newline at end of file
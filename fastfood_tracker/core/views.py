@@ -2,15 +2,18 @@
 
 from rest_framework import status, viewsets
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, action
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from django.http import StreamingHttpResponse
 from datetime import date
-from django.db.models import F, Sum
-from django.db import models
-from django.utils import timezone 
+from django.db.models import F, Sum, Prefetch
+from django.db import models, transaction
+from django.utils.dateparse import parse_date
 import random
+from collections import Counter
 
 # --- NEW IMPORTS for Search/Sort ---
 from django_filters.rest_framework import DjangoFilterBackend
@@ -20,7 +23,8 @@ from rest_framework import filters
 # Replaced MacroTracker with LoggedMeal and LoggedMealItem
 from .models import (
     User, Restaurant, MenuItem, Profile, 
-    FavoriteMeal, LoggedMeal, LoggedMealItem
+    FavoriteMeal, FavoriteMealItem, LoggedMeal, LoggedMealItem,
+    SimilarItem, BestPick, NUTRIENT_FIELDS
 )
 
 # --- UPDATED SERIALIZER IMPORTS ---
@@ -28,8 +32,15 @@ from .models import (
 from .serializers import (
     UserSerializer, RestaurantSerializer, ProfileSerializer, 
     FavoriteMealSerializer, MenuItemSerializer, 
-    LoggedMealSerializer, LoggedMealItemSerializer
+    LoggedMealSerializer, LoggedMealItemSerializer, SimilarItemSerializer,
+    BestPickSerializer
 )
+from .dates import day_range, created_between
+from .similarity import NEIGHBORS_PER_ITEM
+from .rankings import PICKS_PER_LIST
+from .renderers import CSVRenderer, ExportContentNegotiation, NDJSONRenderer
+from .exports import iter_history_rows, stream_csv, stream_ndjson
+from .archive import iter_archived_meals
 
 
 # --- User Management Views (No Change) ---
@@ -83,6 +94,41 @@ class RestaurantViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RestaurantSerializer
     permission_classes = [IsAuthenticated]
 
+    @action(detail=True, methods=['get'])
+    def best(self, request, pk=None):
+        """
+        Returns the precomputed best picks for this restaurant, grouped by goal.
+        Usage: /api/restaurants/1/best/?goal=low_sodium&category=breakfast&limit=5
+        Leave out goal to get every goal, and category for the whole menu.
+        """
+        if not str(pk).isdigit():
+            return Response({'error': 'Restaurant not found.'}, status=status.HTTP_404_NOT_FOUND)
+        goals = [goal for goal, _ in BestPick.GOAL_CHOICES]
+        goal = request.query_params.get('goal')
+        if goal and goal not in goals:
+            return Response({'error': f"'goal' must be one of: {', '.join(goals)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', PICKS_PER_LIST)), 1), PICKS_PER_LIST)
+        except ValueError:
+            limit = PICKS_PER_LIST
+
+        picks = BestPick.objects.filter(
+            restaurant_id=pk,
+            category=request.query_params.get('category', '').strip(),
+            rank__lte=limit,
+        )
+        if goal:
+            picks = picks.filter(goal=goal)
+        picks = list(picks.select_related('menu_item').order_by('goal', 'rank'))
+
+        if not picks and not Restaurant.objects.filter(pk=pk).exists():
+            return Response({'error': 'Restaurant not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        results = {name: [] for name in ([goal] if goal else goals)}
+        for pick in picks:
+            results[pick.goal].append(BestPickSerializer(pick).data)
+        return Response(results)
+
 # --- NEW: MenuItem ViewSet for Search/Sort/Filter ---
 class MenuItemViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -102,6 +148,92 @@ class MenuItemViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['name', 'category']
     ordering_fields = ['name', 'calories', 'protein', 'fat', 'carbohydrates']
 
+    # Most ids accepted by one ?ids= lookup
+    MAX_IDS = 200
+
+    def get_requested_fields(self):
+        """
+        Parses ?fields=id,name,calories into a list of serializer fields,
+        or None to return all of them.
+        """
+        param = self.request.query_params.get('fields')
+        if not param or self.action not in ('list', 'retrieve'):
+            return None
+        fields = [name.strip() for name in param.split(',') if name.strip()]
+        allowed = MenuItemSerializer.Meta.fields
+        unknown = [name for name in fields if name not in allowed]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(allowed)}."})
+        # Keep the usual field order
+        return [name for name in allowed if name in fields]
+
+    def get_requested_ids(self):
+        """
+        Parses ?ids=1,2,3 for fetching many items in one request.
+        """
+        param = self.request.query_params.get('ids')
+        if not param:
+            return None
+        try:
+            ids = {int(value) for value in param.split(',') if value.strip()}
+        except ValueError:
+            raise ValidationError({'ids': 'ids must be a comma-separated list of numbers.'})
+        if len(ids) > self.MAX_IDS:
+            raise ValidationError({'ids': f'At most {self.MAX_IDS} ids per request.'})
+        return ids
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            ids = self.get_requested_ids()
+            if ids is not None:
+                queryset = queryset.filter(id__in=ids)
+
+        # Only read the requested columns from the database. Lists skip model
+        # instances entirely; the serializer reads the dicts from .values().
+        fields = self.get_requested_fields()
+        if fields and self.action == 'list':
+            queryset = queryset.values(*fields)
+        elif fields:
+            queryset = queryset.select_related(None).only(*fields)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Returns the items closest to this one by nutrient profile, read from
+        the precomputed SimilarItem table.
+        Usage: /api/items/5/similar/?k=5&same_category=true&lower=sodium
+        """
+        if not str(pk).isdigit():
+            return Response({'error': 'Menu item not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            k = min(max(int(request.query_params.get('k', 5)), 1), NEIGHBORS_PER_ITEM)
+        except ValueError:
+            k = 5
+        same_category = request.query_params.get('same_category', '').lower() in ('1', 'true', 'yes')
+        lower = request.query_params.get('lower')
+        if lower and lower not in NUTRIENT_FIELDS:
+            return Response({'error': f"'lower' must be one of: {', '.join(NUTRIENT_FIELDS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        neighbors = SimilarItem.objects.filter(menu_item_id=pk, same_category=same_category)
+        if lower:
+            # Only keep neighbours with less of the chosen nutrient than this item
+            neighbors = neighbors.filter(**{f'neighbor__{lower}__lt': F(f'menu_item__{lower}')})
+        neighbors = list(neighbors.select_related('neighbor').order_by('rank')[:k])
+
+        if not neighbors and not MenuItem.objects.filter(pk=pk).exists():
+            return Response({'error': 'Menu item not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = SimilarItemSerializer(neighbors, many=True)
+        return Response(serializer.data)
+
 
 # --- (REPLACED) Meal Logging and Tracking Views ---
 
@@ -109,13 +241,14 @@ class MenuItemViewSet(viewsets.ReadOnlyModelViewSet):
 @permission_classes([IsAuthenticated])
 def get_daily_tracker(request):
     """
-    Calculates and returns the macro totals for the current day.
+    Calculates and returns the macro totals for the current day,
+    where "today" is worked out in the user's own timezone.
     """
-    today = timezone.now().date()
+    start, end = day_range(request.user)
     
     items_today = LoggedMealItem.objects.filter(
         logged_meal__user=request.user,
-        logged_meal__created_at__date=today
+        **created_between(start, end, prefix='logged_meal__')
     ).select_related('menu_item')
     
     totals = { 'calories': 0, 'protein': 0, 'fat': 0, 'carbs': 0 }
@@ -182,49 +315,142 @@ def log_meal(request):
 def get_meal_history(request):
     """
     Returns a list of all LoggedMeal events, newest first.
+    Optional ?start=YYYY-MM-DD and/or ?end=YYYY-MM-DD (inclusive, in the user's
+    timezone) limit the range.
     """
     history = LoggedMeal.objects.filter(user=request.user).order_by('-created_at')
+
+    start = end = None
+    start_param = request.query_params.get('start')
+    end_param = request.query_params.get('end')
+    if start_param or end_param:
+        try:
+            # parse_date returns None for a bad format, but raises for
+            # well-formed dates that don't exist (2024-02-30)
+            start_day = parse_date(start_param) if start_param else None
+            end_day = parse_date(end_param) if end_param else None
+        except ValueError:
+            start_day = end_day = None
+        if (start_param and not start_day) or (end_param and not end_day):
+            return Response({'error': 'Dates must be in YYYY-MM-DD format.'}, status=status.HTTP_400_BAD_REQUEST)
+        if start_day:
+            start = day_range(request.user, start_day)[0]
+        if end_day:
+            end = day_range(request.user, end_day)[1]
+        history = history.filter(**created_between(start, end))
     serializer = LoggedMealSerializer(history, many=True)
-    return Response(serializer.data)
 
-# --- Favorite Meal ViewSet (Updated log action) ---
+    # Meals past the retention horizon live in the archive; they're all older
+    # than any hot meal, so they go after them.
+    archived = list(iter_archived_meals(request.user, start, end))
+    return Response(serializer.data + archived)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([CSVRenderer, NDJSONRenderer])
+def export_meal_history(request):
+    """
+    Streams every logged item for the user, one row per item.
+    Usage: /api/history/export/?format=csv (default) or ?format=ndjson;
+    an Accept header naming neither format gets CSV.
+    """
+    rows = iter_history_rows(request.user)
+    if request.accepted_renderer.format == 'ndjson':
+        body, extension = stream_ndjson(rows), 'ndjson'
+    else:
+        body, extension = stream_csv(rows), 'csv'
+
+    renderer = request.accepted_renderer
+    response = StreamingHttpResponse(body, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+    response['Content-Disposition'] = f'attachment; filename="meal_history.{extension}"'
+    return response
+
+# api_view has no decorator for this one
+export_meal_history.cls.content_negotiation_class = ExportContentNegotiation
+
+# --- Favorite Meal ViewSet ---
 class FavoriteMealViewSet(viewsets.ModelViewSet):
     queryset = FavoriteMeal.objects.all()
     serializer_class = FavoriteMealSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
+        return self.queryset.filter(user=self.request.user).prefetch_related(
+            Prefetch('favorite_items', queryset=FavoriteMealItem.objects.select_related('menu_item'))
+        )
+
+    def _get_item_quantities(self):
+        """
+        Reads the items from the request as {menu_item_id: quantity}.
+        Accepts "items": [{"id": 5, "quantity": 2}] like log_meal, or the older
+        "item_ids": [5, 5, 22] where repeated ids count as extra quantity.
+        Returns None if the request didn't include any items.
+        """
+        quantities = Counter()
+        try:
+            if 'items' in self.request.data:
+                for item_data in self.request.data.get('items') or []:
+                    quantity = int(item_data.get('quantity', 1))
+                    if quantity < 1:
+                        raise ValidationError({'error': 'Quantities must be at least 1.'})
+                    quantities[int(item_data['id'])] += quantity
+            elif 'item_ids' in self.request.data:
+                for item_id in self.request.data.get('item_ids') or []:
+                    quantities[int(item_id)] += 1
+            else:
+                return None
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValidationError({'error': 'Items must look like [{"id": 5, "quantity": 1}].'})
+
+        found = MenuItem.objects.filter(id__in=quantities).count()
+        if found != len(quantities):
+            raise ValidationError({'error': 'One or more menu items not found.'})
+        return quantities
+
+    def _save_items(self, favorite_meal, quantities):
+        """
+        Replaces the stored rows with one bulk insert and refreshes the totals.
+        """
+        favorite_meal.favorite_items.all().delete()
+        FavoriteMealItem.objects.bulk_create([
+            FavoriteMealItem(favorite_meal=favorite_meal, menu_item_id=item_id, quantity=quantity)
+            for item_id, quantity in quantities.items()
+        ])
+        favorite_meal.refresh_totals()
 
     def perform_create(self, serializer):
-        item_ids = self.request.data.get('item_ids', [])
-        favorite_meal = serializer.save(user=self.request.user)
-        favorite_meal.items.set(item_ids)
+        quantities = self._get_item_quantities() or {}
+        with transaction.atomic():
+            favorite_meal = serializer.save(user=self.request.user)
+            self._save_items(favorite_meal, quantities)
+
+    def perform_update(self, serializer):
+        quantities = self._get_item_quantities()
+        with transaction.atomic():
+            favorite_meal = serializer.save()
+            if quantities is not None:
+                self._save_items(favorite_meal, quantities)
 
-    # --- THIS FUNCTION IS NOW FIXED ---
     @action(detail=True, methods=['post'])
     def log(self, request, pk=None):
         """
-        Logs a favorite meal to the new history system.
+        Logs a favorite meal to the history system, copying the stored
+        quantities in a single bulk insert.
         """
         favorite_meal = self.get_object()
-        items_to_log = favorite_meal.items.all()
+        # Already loaded by the prefetch in get_queryset()
+        rows = favorite_meal.favorite_items.all()
         
-        if not items_to_log:
+        if not rows:
             return Response({'error': 'This favorite meal has no items to log.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create the parent meal "event"
-        new_meal = LoggedMeal.objects.create(user=request.user, name=favorite_meal.name)
-        
-        items_to_create = [
-            LoggedMealItem(
-                logged_meal=new_meal,
-                menu_item=item,
-                quantity=1 # Favorite meals default to quantity 1
-            ) for item in items_to_log
-        ]
-        
-        LoggedMealItem.objects.bulk_create(items_to_create)
+        with transaction.atomic():
+            # Create the parent meal "event"
+            new_meal = LoggedMeal.objects.create(user=request.user, name=favorite_meal.name)
+            LoggedMealItem.objects.bulk_create([
+                LoggedMealItem(logged_meal=new_meal, menu_item_id=row.menu_item_id, quantity=row.quantity)
+                for row in rows
+            ])
         
         serializer = LoggedMealSerializer(new_meal)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,64 @@
+# In core/warmup.py
+"""
+Does the slow first-time work of a fresh worker at boot instead of during
+its first requests: importing the API code (views, serializers, DRF,
+django_filters) and the classes DRF loads lazily, and opening the database
+connections. The app has no in-process catalog cache to fill, so catalog
+data is not preloaded here.
+
+Called from fastfood_tracker/wsgi.py and asgi.py (not from
+CoreConfig.ready(), which also runs for every manage.py command and where
+Django advises against database queries). Set WARMUP_ON_BOOT=false to skip.
+Run `python manage.py startup_profile` to see what it saves.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _load_urls():
+    # Importing the URLconf pulls in the views, serializers, DRF,
+    # django_filters, and everything they import.
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def _load_drf_settings():
+    # DRF imports the classes named in REST_FRAMEWORK lazily, on first use
+    from rest_framework.settings import api_settings
+    api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    api_settings.DEFAULT_PERMISSION_CLASSES
+    api_settings.DEFAULT_RENDERER_CLASSES
+    api_settings.DEFAULT_PARSER_CLASSES
+
+
+def _open_connections():
+    from django.db import connections
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+STEPS = [
+    ('urls', _load_urls),
+    ('drf_settings', _load_drf_settings),
+    ('connections', _open_connections),
+]
+
+
+def warm_up():
+    """
+    Runs every warm-up step and returns {step: seconds}. A failing step is
+    logged and skipped; warm-up must never stop a worker from booting.
+    """
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception('Warm-up step %r failed', name)
+        timings[name] = time.perf_counter() - started
+    logger.info('Warm-up finished in %.3fs: %s', sum(timings.values()),
+                ', '.join(f'{name}={seconds:.3f}s' for name, seconds in timings.items()))
+    return timings
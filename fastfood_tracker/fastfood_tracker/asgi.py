@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fastfood_tracker.settings')
 
 application = get_asgi_application()
+
+# Do the slow first-request work (imports, DB connections) now, while the
+# worker boots. See core/warmup.py.
+if os.environ.get('WARMUP_ON_BOOT', 'true').lower() == 'true':
+    from core.warmup import warm_up
+    warm_up()
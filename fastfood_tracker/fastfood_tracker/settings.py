@@ -66,6 +66,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinMiddleware', # Picks primary vs. read replica
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -99,6 +100,28 @@ DATABASES = {
     )
 }
 
+# Optional read replica. Catalog and history reads go here (see core/db_routers.py).
+# To try it locally with two SQLite files:
+#   DATABASE_URL=sqlite:///primary.sqlite3 REPLICA_DATABASE_URL=sqlite:///replica.sqlite3
+#   python manage.py migrate && python manage.py migrate --database=replica
+# The replica file won't receive writes, so copy primary.sqlite3 over it to "replicate".
+# In tests the replica gets its own empty test database (see ReplicaRoutingTests).
+DATABASE_REPLICA_ALIAS = 'replica'
+if os.environ.get('REPLICA_DATABASE_URL'):
+    DATABASES[DATABASE_REPLICA_ALIAS] = dj_database_url.parse(
+        os.environ['REPLICA_DATABASE_URL'],
+        conn_max_age=600
+    )
+
+DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+
+# How long a client keeps reading from the primary after it writes something
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Meals older than this many days are moved into the monthly archive
+# by `python manage.py archive_meals` (see core/archive.py)
+MEAL_ARCHIVE_AFTER_DAYS = int(os.environ.get('MEAL_ARCHIVE_AFTER_DAYS', 365))
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [